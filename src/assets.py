@@ -0,0 +1,68 @@
+import json
+import os
+from instrument import logger
+from manifest import GENERATOR_VERSION, hash_bytes, hash_file, load_manifest, save_manifest
+from static_sync import DEFAULT_SYNC_JOBS, STATIC_MANIFEST_PATH, list_static_files, sync_static
+
+
+ASSET_MANIFEST_PATH = "./.build_cache/asset_manifest.json"
+FINGERPRINT_LENGTH = 10
+
+
+def fingerprinted_name(relative, digest):
+    # "images/tom.png" -> "images/tom.3f2a9b1c0d.png". Files without a
+    # suffix get the fingerprint appended.
+    directory, name = os.path.split(relative)
+    stem, suffix = os.path.splitext(name)
+    if not stem:
+        stem, suffix = suffix, ""
+    name = f"{stem}.{digest[:FINGERPRINT_LENGTH]}{suffix}"
+    return f"{directory}/{name}" if directory else name
+
+
+def fingerprint_assets(static_dir, manifest_path=ASSET_MANIFEST_PATH):
+    # Returns the asset map: static path -> fingerprinted path, both
+    # relative to the site root. Only files whose size or mtime changed
+    # since the last build are hashed again.
+    manifest = load_manifest(manifest_path, "files", GENERATOR_VERSION)
+    previous = manifest["files"] if manifest is not None else {}
+    files = {}
+    assets = {}
+    hashed = 0
+    for relative, stat in list_static_files(static_dir).items():
+        old_entry = previous.get(relative)
+        if old_entry is not None and (old_entry["size"], old_entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            digest = old_entry["hash"]
+        else:
+            digest = hash_file(os.path.join(static_dir, relative))
+            hashed += 1
+        files[relative] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+        assets[relative] = fingerprinted_name(relative, digest)
+    save_manifest({"version": GENERATOR_VERSION, "files": files}, manifest_path)
+    logger.debug(f"Fingerprinted {len(assets)} asset(s), {hashed} hashed")
+    return assets
+
+
+def assets_hash(assets):
+    # Part of the incremental template hash: pages that reference a changed
+    # asset have to be rendered again with its new name.
+    return hash_bytes(json.dumps(assets or {}, sort_keys=True).encode())
+
+
+def sync_assets(
+    static_dir,
+    dest_dir,
+    manifest_path=STATIC_MANIFEST_PATH,
+    asset_manifest_path=ASSET_MANIFEST_PATH,
+    checksum=False,
+    hardlink=False,
+    jobs=DEFAULT_SYNC_JOBS,
+):
+    # Copies static_dir into dest_dir under fingerprinted names, so the
+    # files can be served with a long cache lifetime: a changed file gets a
+    # new name instead of replacing the old one in place. Outputs of older
+    # versions are removed like any other stale static file. Returns the
+    # asset map.
+    assets = fingerprint_assets(static_dir, asset_manifest_path)
+    sync_static(static_dir, dest_dir, manifest_path, checksum, hardlink, jobs, names=assets)
+    return assets
@@ -0,0 +1,62 @@
+import sys
+import tracemalloc
+from block_splitter import markdown_to_html_node
+from htmlnode import LeafNode, ParentNode
+from node_splitter import text_to_textnodes
+
+
+def generate_document(sections):
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i}")
+        parts.append(f"Paragraph {i} with **bold**, _italic_, `code` and a [link](/page/{i}) plus ![img](/images/{i}.png).")
+        parts.append("\n".join(f"- item {j} of section {i} with **emphasis**" for j in range(10)))
+        parts.append(f"> quoted text {i} with a [ref](https://example.com/{i})")
+    return "\n\n".join(parts)
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        if isinstance(current, ParentNode):
+            stack.extend(current.children)
+    return count
+
+
+def instance_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    markdown = generate_document(sections)
+    paragraph = " ".join(f"word **b{i}** [l](/x/{i})" for i in range(sections * 10))
+
+    text_nodes, text_bytes = measure(lambda: text_to_textnodes(paragraph))
+    tree, tree_bytes = measure(lambda: markdown_to_html_node(markdown))
+    tree_nodes = count_nodes(tree)
+
+    print(f"document: {len(markdown) / 1e6:.2f} MB markdown, {sections} sections")
+    print(f"TextNode:  {len(text_nodes):>8} nodes  {text_bytes / len(text_nodes):7.1f} bytes/node (incl. strings)")
+    print(f"HTMLNode:  {tree_nodes:>8} nodes  {tree_bytes / tree_nodes:7.1f} bytes/node (incl. strings, props)")
+    print(f"instance size: TextNode {instance_size(text_nodes[0])} B, "
+          f"LeafNode {instance_size(LeafNode('b', 'x'))} B, ParentNode {instance_size(ParentNode('p', []))} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import argparse
+import gc
+import json
+import multiprocessing
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from block_splitter import BlockType, block_to_block_type, inline_fragment, markdown_to_blocks, markdown_to_html_batch, markdown_to_html_node
+from node_splitter import text_to_textnodes
+
+
+# Synthetic corpora. Each returns a list of markdown documents ("pages");
+# scale grows the total amount of text roughly linearly.
+
+def long_paragraphs(scale):
+    sentence = "The quick brown fox jumps over the lazy dog with **bold** words and _italic_ ones. "
+    page = "# Long paragraphs\n\n" + "\n\n".join(sentence * 200 for _ in range(20))
+    return [page] * scale
+
+
+def link_heavy(scale):
+    links = " ".join(f"see [page {i}](/blog/page-{i}) and ![pic {i}](/images/{i}.png)" for i in range(2000))
+    page = "# Links\n\n" + links
+    return [page] * scale
+
+
+def deep_lists(scale):
+    unordered = "\n".join(f"- item {i} with `code` and **bold**" for i in range(2000))
+    ordered = "\n".join(f"{i}. step {i} links to [docs](/docs/{i})" for i in range(1, 2001))
+    page = "# Lists\n\n" + unordered + "\n\n" + ordered
+    return [page] * scale
+
+
+def huge_code(scale):
+    code = "\n".join(f"    result = compute(value, {i}) + offset" for i in range(20000))
+    page = "# Code\n\n```\n" + code + "\n```"
+    return [page] * scale
+
+
+def many_small_pages(scale):
+    return [
+        f"# Page {i}\n\nA short page with a [link](/page/{i}) and some **text**.\n\n> a quote\n\n- one\n- two"
+        for i in range(500 * scale)
+    ]
+
+
+def repeated_fragments(scale):
+    # Generated reference docs: the same headings, list items and
+    # table-like lines over and over.
+    section = (
+        "## Parameters\n\n"
+        "- `name` (**string**): the name of the resource\n"
+        "- `enabled` (**bool**): whether the resource is _active_\n"
+        "- `count` (**int**): how many copies to keep\n\n"
+        "| field | type | default |\n\n"
+        "Returns **nothing**. See the `Errors` section."
+    )
+    page = "# Reference\n\n" + "\n\n".join([section] * 1000)
+    return [page] * scale
+
+
+CORPORA = {
+    "long_paragraphs": long_paragraphs,
+    "link_heavy": link_heavy,
+    "deep_lists": deep_lists,
+    "huge_code": huge_code,
+    "many_small_pages": many_small_pages,
+    "repeated_fragments": repeated_fragments,
+}
+
+
+def inline_texts(blocks):
+    return [block for block in blocks if block_to_block_type(block) != BlockType.CODE]
+
+
+def stage_functions(pages, executor=None, batch_jobs=1):
+    # Every stage gets its input prepared up front so only the stage
+    # itself is inside the timed region. convert_per_call and convert_batch
+    # produce the same strings; an executor adds a run of the batch API
+    # fanned out to its batch_jobs worker processes.
+    blocks = [block for page in pages for block in markdown_to_blocks(page)]
+    texts = inline_texts(blocks)
+    trees = [markdown_to_html_node(page) for page in pages]
+    functions = {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(page) for page in pages],
+        "block_to_block_type": lambda: [block_to_block_type(block) for block in blocks],
+        "text_to_textnodes": lambda: [text_to_textnodes(text) for text in texts],
+        "markdown_to_html_node": lambda: [markdown_to_html_node(page) for page in pages],
+        "to_html": lambda: [tree.to_html() for tree in trees],
+        "to_html_minified": lambda: [tree.to_html(minify=True) for tree in trees],
+        "convert_per_call": lambda: [markdown_to_html_node(page).to_html() for page in pages],
+        "convert_batch": lambda: list(markdown_to_html_batch(pages)),
+    }
+    if executor is not None:
+        functions[f"convert_batch_jobs{batch_jobs}"] = lambda: list(
+            markdown_to_html_batch(pages, jobs=batch_jobs, executor=executor, chunksize=16)
+        )
+    return functions
+
+
+def minified_sizes(corpora, scale=1):
+    # Corpus -> (plain bytes, minified bytes) of the serialized trees.
+    sizes = {}
+    for name in corpora:
+        trees = [markdown_to_html_node(page) for page in CORPORA[name](scale)]
+        plain = sum(len(tree.to_html().encode()) for tree in trees)
+        minified = sum(len(tree.to_html(minify=True).encode()) for tree in trees)
+        sizes[name] = (plain, minified)
+    return sizes
+
+
+def print_minified_sizes(sizes):
+    print(f"{'minified output':<42} {'bytes':>11} {'minified':>11} {'saved':>7}")
+    for name, (plain, minified) in sizes.items():
+        print(f"{name:<42} {plain:>11} {minified:>11} {1 - minified / plain:>7.1%}")
+
+
+# Set in batch worker processes by init_memo_worker.
+memo_barrier = None
+
+
+def init_memo_worker(barrier):
+    global memo_barrier
+    memo_barrier = barrier
+
+
+def clear_worker_memo(_):
+    # Waiting for the others makes every worker take exactly one of these.
+    inline_fragment.cache_clear()
+    memo_barrier.wait()
+
+
+def clear_inline_memos(executor=None, jobs=1):
+    # The inline memo is process-global, so without this every call after
+    # the first would see the fragments of the pages converted before it.
+    # Stages are timed cold: a corpus only gets hits from repeats within
+    # itself, as one build would.
+    inline_fragment.cache_clear()
+    if executor is not None:
+        list(executor.map(clear_worker_memo, range(jobs)))
+
+
+def time_stage(function, repeat, min_seconds=0.05, setup=None):
+    # Like timeit: fast stages are looped until one measurement takes at
+    # least min_seconds, GC is off while timing, and the best of repeat
+    # measurements is reported as seconds per call. setup runs before
+    # every call, outside the timed region.
+    number = 1
+    while True:
+        elapsed = timed_calls(function, number, setup)
+        if elapsed >= min_seconds:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, timed_calls(function, number, setup) / number)
+    return best
+
+
+def timed_calls(function, number, setup=None):
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            return time.perf_counter() - start
+        elapsed = 0.0
+        for _ in range(number):
+            setup()
+            start = time.perf_counter()
+            function()
+            elapsed += time.perf_counter() - start
+        return elapsed
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def peak_memory(function, setup=None):
+    # Run separately from the timing loop: tracemalloc slows allocation down.
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(corpora, scale=1, repeat=3, batch_jobs=1):
+    if batch_jobs > 1:
+        # One pool for the whole run, as a service embedding the batch API
+        # would keep; its startup isn't part of any stage.
+        barrier = multiprocessing.Barrier(batch_jobs)
+        with ProcessPoolExecutor(max_workers=batch_jobs, initializer=init_memo_worker, initargs=(barrier,)) as executor:
+            return benchmark_corpora(corpora, scale, repeat, executor, batch_jobs)
+    return benchmark_corpora(corpora, scale, repeat)
+
+
+def benchmark_corpora(corpora, scale, repeat, executor=None, batch_jobs=1):
+    results = {}
+    setup = lambda: clear_inline_memos(executor, batch_jobs)
+    for name in corpora:
+        pages = CORPORA[name](scale)
+        size = sum(len(page.encode()) for page in pages)
+        for stage, function in stage_functions(pages, executor, batch_jobs).items():
+            seconds = max(time_stage(function, repeat, setup=setup), 1e-9)
+            results[f"{name}/{stage}"] = {
+                "seconds": seconds,
+                "mb_per_s": size / seconds / 1e6,
+                "pages_per_s": len(pages) / seconds,
+                "peak_kb": peak_memory(function, setup) / 1024,
+            }
+    return results
+
+
+def compare_results(baseline, current, threshold):
+    # A stage regresses if its throughput drops, or its peak memory grows,
+    # by more than threshold (0.1 == 10%). Stages missing from either run
+    # are ignored.
+    regressions = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if now["mb_per_s"] < before["mb_per_s"] * (1 - threshold):
+            regressions.append(f"{key}: throughput {before['mb_per_s']:.2f} -> {now['mb_per_s']:.2f} MB/s")
+        if now["peak_kb"] > before["peak_kb"] * (1 + threshold):
+            regressions.append(f"{key}: peak memory {before['peak_kb']:.0f} -> {now['peak_kb']:.0f} KB")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'stage':<42} {'MB/s':>9} {'pages/s':>11} {'peak KB':>10}")
+    for key, result in results.items():
+        print(f"{key:<42} {result['mb_per_s']:>9.2f} {result['pages_per_s']:>11.1f} {result['peak_kb']:>10.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the markdown-to-HTML pipeline")
+    parser.add_argument("--corpus", action="append", choices=sorted(CORPORA), help="corpus to run (repeatable, default: all)")
+    parser.add_argument("--scale", type=int, default=1, help="multiply the size of every corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per stage, the best one is kept")
+    parser.add_argument("--batch-jobs", type=int, default=1, metavar="N", help="also time the batch API with N worker processes")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="allowed regression before failing (default 0.20)")
+    args = parser.parse_args(argv)
+
+    corpora = args.corpus or list(CORPORA)
+    results = run_benchmarks(corpora, args.scale, args.repeat, args.batch_jobs)
+    print_results(results)
+    print()
+    print_minified_sizes(minified_sizes(corpora, args.scale))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No stage regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,16 @@
+import functools
+import io
+import itertools
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from htmlnode import HTMLNode, LeafNode, ParentNode
-from textnode import TextType, TextNode
+from textnode import TextNode
 from node_splitter import text_to_textnodes
-
-
-def markdown_to_blocks(markdown):
-    split_markdown = markdown.strip().split("\n\n")
-    result = []
-    for block in split_markdown:
-        if block.strip():
-            new_block = block.strip()
-            result.append(new_block)
-    return result
+from instrument import add_timing
+from search import add_node_terms
 
 
 class BlockType(Enum):
@@ -24,26 +22,197 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 
+ORDERED_LIST_PATTERN = re.compile(r"\d+\. .+")
+QUOTE_MARKER_PATTERN = re.compile(r"^>\s*", re.MULTILINE)
+CODE_FENCE = "```"
+# Inline conversions are memoized for texts up to this long; longer ones
+# (whole paragraphs) rarely repeat and would only churn the cache.
+INLINE_CACHE_SIZE = 4096
+INLINE_CACHE_MAX_TEXT = 256
+# markdown_to_html_batch hands workers lists of this many strings; a batch
+# that fits in one chunk is converted in-process.
+BATCH_CHUNK_SIZE = 256
+
+
+def is_fenced_code(block):
+    return block.startswith(CODE_FENCE) and len(block) >= 6 and block.endswith(CODE_FENCE)
+
+
 def block_to_block_type(block):
-    if re.match(r'^#{1,6}', block):
+    # Only the start of the block decides its type, so each check looks at a
+    # character or two before (at most) one precompiled pattern runs.
+    first = block[:1]
+    if first == "#":
         return BlockType.HEADING
-    if re.match(r'```.*?```', block):
+    if first == "`" and is_fenced_code(block):
         return BlockType.CODE
-    if re.match(r'^>.*', block):
+    if first == ">":
         return BlockType.QUOTE
-    if re.match(r'^- .*', block):
+    if block.startswith("- "):
         return BlockType.UNORDERED_LIST
-    if re.match(r'^(\d+)\. .+', block):
+    if first.isdigit() and ORDERED_LIST_PATTERN.match(block):
         return BlockType.ORDERED_LIST
     return BlockType.PARAGRAPH
 
 
+def fence_close(text, start):
+    # Index just past the first line at or after start that ends with ```,
+    # or -1 if the fence isn't closed in text. Looking for a single backtick
+    # is a memchr; searching for all three is several times slower on big
+    # code blocks.
+    position = text.find("`", start)
+    while position != -1:
+        if text.startswith(CODE_FENCE, position):
+            line_end = text.find("\n", position)
+            if line_end == -1:
+                line_end = len(text)
+            if not text[position + 3:line_end].strip():
+                return line_end
+        position = text.find("`", position + 1)
+    return -1
+
+
+def split_blocks(markdown):
+    # Yields (BlockType, block text) for a whole document in one pass.
+    for block_type, block in split_chunks(markdown):
+        yield block_type or block_to_block_type(block), block
+
+
+def split_chunks(markdown):
+    # The document is split on blank lines at C speed; only a ``` fence,
+    # which may contain blank lines, pulls in the following chunks until its
+    # closing line. Text after the closing fence starts a new block. Yields
+    # (BlockType.CODE, text) for fences and (None, text) for blocks that
+    # still need classifying, so markdown_to_blocks can skip that step.
+    chunks = markdown.split("\n\n")
+    index = 0
+    carry = None
+    while True:
+        if carry is not None:
+            chunk, carry = carry, None
+        elif index < len(chunks):
+            chunk = chunks[index]
+            index += 1
+        else:
+            return
+        block = chunk.strip()
+        if not block:
+            continue
+        if not block.startswith(CODE_FENCE):
+            yield None, block
+            continue
+        newline = block.find("\n")
+        first_line = block if newline == -1 else block[:newline].rstrip()
+        if is_fenced_code(first_line):
+            yield BlockType.CODE, first_line
+            if newline != -1:
+                carry = chunk[chunk.find("\n", chunk.find(CODE_FENCE)) + 1:]
+            continue
+        if newline != -1 and fence_close(block, newline + 1) == len(block):
+            # The usual case: the fence closes at the end of its own chunk.
+            yield BlockType.CODE, block
+            continue
+        # The fence is the first non-blank text of the chunk.
+        lead = chunk.find(CODE_FENCE)
+        close = -1 if newline == -1 else fence_close(chunk, lead + newline + 1)
+        if close != -1:
+            carry = chunk[close:]
+            yield BlockType.CODE, chunk[lead:close].rstrip()
+            continue
+        parts = [chunk[lead:]]
+        while close == -1 and index < len(chunks):
+            parts.append(chunks[index])
+            index += 1
+            close = fence_close(parts[-1], 0)
+        if close != -1:
+            carry = parts[-1][close:]
+            parts[-1] = parts[-1][:close]
+        # An unclosed fence runs to the end of the document.
+        yield BlockType.CODE, "\n\n".join(parts).rstrip()
+
+
+def iter_blocks(lines):
+    # Same blocks as split_blocks, from an iterable of lines (with or without
+    # their newline, e.g. an open file), holding only the current block.
+    block = []
+    in_fence = False
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if in_fence:
+            block.append(line)
+            if line.rstrip().endswith(CODE_FENCE):
+                yield BlockType.CODE, block_text(block)
+                block = []
+                in_fence = False
+            continue
+        if not line:
+            text = block_text(block)
+            if text:
+                yield block_to_block_type(text), text
+            block = []
+            continue
+        if line.lstrip().startswith(CODE_FENCE) and not block_text(block):
+            block = []
+            if is_fenced_code(line.strip()):
+                yield BlockType.CODE, line.strip()
+                continue
+            in_fence = True
+        block.append(line)
+    text = block_text(block)
+    if text:
+        yield (BlockType.CODE if in_fence else block_to_block_type(text)), text
+
 
-def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
+def block_text(lines):
+    return "\n".join(lines).strip()
+
+
+def markdown_to_blocks(markdown):
+    # Splitting on blank lines is only wrong around fenced code, and a
+    # single-character search rules that out almost for free.
+    if "`" in markdown:
+        return [block for _, block in split_chunks(markdown)]
+    blocks = []
+    for block in markdown.split("\n\n"):
+        block = block.strip()
+        if block:
+            blocks.append(block)
+    return blocks
+
+
+
+@functools.lru_cache(maxsize=INLINE_CACHE_SIZE)
+def inline_fragment(text):
+    # The leaves are shared by every tree the text appears in; nothing
+    # mutates a node once it is built.
+    return tuple(TextNode.text_node_to_html_node(text_node) for text_node in text_to_textnodes(text))
+
+
+def inline_cache_counts():
+    info = inline_fragment.cache_info()
+    return {"inline_cache_hits": info.hits, "inline_cache_misses": info.misses}
+
+
+def text_to_children(text, resolve_url=None, timings=None, resolve_image=None):
+    # Text without links or images converts the same whatever the resolve
+    # hooks are, so short ones (list items, headings, repeated lines) come
+    # from the memo keyed by the raw text.
+    if "[" not in text and len(text) <= INLINE_CACHE_MAX_TEXT:
+        if timings is None:
+            return list(inline_fragment(text))
+        start = time.perf_counter()
+        children = list(inline_fragment(text))
+        add_timing(timings, "inline_parse", start)
+        return children
+    if timings is None:
+        text_nodes = text_to_textnodes(text)
+    else:
+        start = time.perf_counter()
+        text_nodes = text_to_textnodes(text)
+        add_timing(timings, "inline_parse", start)
     html_nodes = []
     for text_node in text_nodes:
-        html_node = TextNode.text_node_to_html_node(text_node)
+        html_node = TextNode.text_node_to_html_node(text_node, resolve_url, resolve_image)
         html_nodes.append(html_node)
     return html_nodes
     
@@ -61,53 +230,229 @@ def determine_heading(block):
     return heading_tag, heading_text
 
 
-def markdown_to_html_node(markdown):
+def code_block_text(block):
+    first_newline = block.find("\n")
+    if first_newline == -1:
+        return block[3:-3]
+    # The rest of the opening line is an info string ("```python"), and the
+    # closing fence may share its line with the last line of code. Slicing
+    # around the first and last lines avoids splitting big code blocks.
+    last_newline = block.rfind("\n")
+    last = block[last_newline + 1:].rstrip()
+    if not last.endswith(CODE_FENCE):
+        return block[first_newline + 1:] + "\n"
+    head = block[first_newline + 1:last_newline + 1]
+    last = last[:-3]
+    if last.strip():
+        return head + last + "\n"
+    return head or "\n"
+
+
+def list_item_text(line, block_type):
+    if block_type == BlockType.UNORDERED_LIST:
+        if line.startswith("-"):
+            line = line[1:]
+        return line.strip()
+    digits = 0
+    while digits < len(line) and line[digits].isdigit():
+        digits += 1
+    if digits and line[digits:digits + 1] == ".":
+        line = line[digits + 1:]
+    return line.strip()
+
+
+def block_to_html_node(block_type, block, resolve_url=None, timings=None, resolve_image=None):
+    if block_type == BlockType.HEADING:
+        heading_tag, heading_text = determine_heading(block)
+        return ParentNode(heading_tag, text_to_children(heading_text, resolve_url, timings, resolve_image))
+    if block_type == BlockType.PARAGRAPH:
+        return ParentNode("p", text_to_children(block, resolve_url, timings, resolve_image))
+    if block_type == BlockType.CODE:
+        code_html_node = LeafNode(None, code_block_text(block))
+        return ParentNode("pre", [ParentNode("code", [code_html_node])])
+    if block_type == BlockType.QUOTE:
+        quote_text = QUOTE_MARKER_PATTERN.sub("", block).strip()
+        return ParentNode("blockquote", text_to_children(quote_text, resolve_url, timings, resolve_image))
+    list_items = []
+    for line in block.split("\n"):
+        if line.strip():
+            item_children = text_to_children(list_item_text(line, block_type), resolve_url, timings, resolve_image)
+            list_items.append(ParentNode("li", item_children))
+    tag = "ul" if block_type == BlockType.UNORDERED_LIST else "ol"
+    return ParentNode(tag, list_items)
+
+
+class PageResult:
+    # What converting one page produces: the <div> node plus metadata that
+    # falls out of the same parse, so callers never split the page again.
+    # title is the text of the first h1 and description the plain text of
+    # the first paragraph; either is None when the page has none.
+    def __init__(self, node, title=None, description=None):
+        self.node = node
+        self.title = title
+        self.description = description
+
+
+    def __repr__(self):
+        return f"PageResult({self.title}, {self.description}, {self.node})"
+
+
+def is_title_block(block_type, block):
+    return block_type == BlockType.HEADING and block.startswith("# ")
+
+
+def node_text(node):
+    # Plain text of a paragraph node, whose children are all leaves.
+    return "".join(child.value for child in node.children)
+
+
+def markdown_to_page(markdown, resolve_url=None, timings=None, resolve_image=None):
+    # When a timings dict is passed, the time spent splitting blocks, parsing
+    # inline markdown and building the rest of the tree is added to it.
+    start = time.perf_counter()
+    inline_before = timings.get("inline_parse", 0.0) if timings is not None else 0.0
+    blocks = list(split_blocks(markdown))
+    tree_start = add_timing(timings, "block_split", start)
+    title = description = None
     block_list = []
-    split_markdown = markdown_to_blocks(markdown)
-    for block in split_markdown:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.HEADING:
-            heading_tag, heading_text = determine_heading(block)
-            heading_children = text_to_children(heading_text)
-            html_node = ParentNode(heading_tag, heading_children)
-            block_list.append(html_node)
-        elif block_type == BlockType.PARAGRAPH:
-            paragraph_children = text_to_children(block)
-            html_node = ParentNode("p", paragraph_children)
-            block_list.append(html_node)
-        elif block_type == BlockType.CODE:
-            code_content = block.replace("```", "")
-            code_text_node = TextNode(code_content, TextType.TEXT)
-            code_html_node = TextNode.text_node_to_html_node(code_text_node)
-            code_node = ParentNode("code", [code_html_node])
-            pre_node = ParentNode("pre", [code_node])
-            block_list.append(pre_node)
-        elif block_type == BlockType.QUOTE:
-            quote_text = re.sub(r'^>\s*', '', block, flags=re.MULTILINE).strip()
-            quote_children = text_to_children(quote_text)
-            html_node = ParentNode("blockquote", quote_children)
-            block_list.append(html_node)
-        elif block_type == BlockType.UNORDERED_LIST:
-            items = block.split('\n')
-            list_items = []
-            for item in items:
-                if item.strip():
-                     item_text = re.sub(r'^-\s*', '', item).strip()
-                     item_children = text_to_children(item_text)
-                     li_node = ParentNode("li", item_children)
-                     list_items.append(li_node)
-            html_node = ParentNode("ul", list_items)
-            block_list.append(html_node)
-        elif block_type == BlockType.ORDERED_LIST:
-            items = block.split('\n')
-            list_items = []
-            for item in items:
-                if item.strip():  # Skip empty lines
-                    item_text = re.sub(r'^\d+\.\s*', '', item).strip()
-                    item_children = text_to_children(item_text)
-                    li_node = ParentNode("li", item_children)
-                    list_items.append(li_node)
-            html_node = ParentNode("ol", list_items)
-            block_list.append(html_node)
+    for block_type, block in blocks:
+        node = block_to_html_node(block_type, block, resolve_url, timings, resolve_image)
+        if title is None and is_title_block(block_type, block):
+            title = block[2:].strip()
+        elif description is None and block_type == BlockType.PARAGRAPH:
+            description = node_text(node)
+        block_list.append(node)
     parent_node = ParentNode("div", block_list)
-    return parent_node
\ No newline at end of file
+    if timings is not None:
+        inline = timings.get("inline_parse", 0.0) - inline_before
+        add_timing(timings, "tree_build", tree_start + inline)
+    return PageResult(parent_node, title, description)
+
+
+def markdown_to_html_node(markdown, resolve_url=None, timings=None, resolve_image=None):
+    return markdown_to_page(markdown, resolve_url, timings, resolve_image).node
+
+
+def scan_page(blocks):
+    # Metadata-only counterpart of markdown_to_page for (BlockType, text)
+    # pairs, e.g. from iter_blocks over an open file: nothing else is
+    # converted and iteration stops as soon as the title and description
+    # are known.
+    title = description = None
+    for block_type, block in blocks:
+        if title is None and is_title_block(block_type, block):
+            title = block[2:].strip()
+        elif description is None and block_type == BlockType.PARAGRAPH:
+            description = node_text(ParentNode("p", text_to_children(block)))
+        if title is not None and description is not None:
+            break
+    return PageResult(None, title, description)
+
+
+class StreamedDocument:
+    # Stands in for the <div> node markdown_to_html_node returns when the
+    # document is too big to hold in memory: blocks are read from lines,
+    # converted and written one at a time, so only the current block and its
+    # nodes are ever alive. A terms set, when given, collects each block's
+    # search terms as it goes.
+    def __init__(self, lines, resolve_url=None, timings=None, terms=None, resolve_image=None):
+        self.lines = lines
+        self.resolve_url = resolve_url
+        self.resolve_image = resolve_image
+        self.timings = timings
+        self.terms = terms
+
+
+    def write_html(self, out, minify=False):
+        # Minified, each block is written once the next one is known, so
+        # optional end tags are left out exactly as in the whole tree.
+        timings = self.timings
+        out.write("<div>")
+        previous = None
+        start = time.perf_counter()
+        for block_type, block in iter_blocks(self.lines):
+            start = add_timing(timings, "block_split", start)
+            inline_before = timings.get("inline_parse", 0.0) if timings is not None else 0.0
+            node = block_to_html_node(block_type, block, self.resolve_url, timings, self.resolve_image)
+            if timings is not None:
+                inline = timings.get("inline_parse", 0.0) - inline_before
+                start = add_timing(timings, "tree_build", start + inline)
+            if self.terms is not None:
+                add_node_terms(node, self.terms)
+                start = add_timing(timings, "search", start)
+            if not minify:
+                node.write_html(out)
+            else:
+                if previous is not None:
+                    out.write("".join(previous.iter_minified_html("div", node)))
+                previous = node
+            start = time.perf_counter()
+        if previous is not None:
+            out.write("".join(previous.iter_minified_html("div")))
+        out.write("</div>")
+
+
+    def to_html(self, minify=False):
+        out = io.StringIO()
+        self.write_html(out, minify)
+        return out.getvalue()
+
+
+    def __repr__(self):
+        return f"StreamedDocument({self.lines!r})"
+
+
+def iter_html_batch(markdowns, minify=False):
+    # In-process half of markdown_to_html_batch. Every document is
+    # serialized into the same scratch list, and the blocks go straight
+    # into it without the <div> node, PageResult or title bookkeeping of
+    # markdown_to_page.
+    parts = []
+    append = parts.append
+    for markdown in markdowns:
+        if minify:
+            nodes = [block_to_html_node(block_type, block) for block_type, block in split_blocks(markdown)]
+            parts.extend(ParentNode("div", nodes).iter_minified_html())
+        else:
+            append("<div>")
+            for block_type, block in split_blocks(markdown):
+                block_to_html_node(block_type, block).append_html(append)
+            append("</div>")
+        yield "".join(parts)
+        parts.clear()
+
+
+def convert_chunk(markdowns, minify=False):
+    # Runs in a worker process.
+    return list(iter_html_batch(markdowns, minify))
+
+
+def markdown_to_html_batch(markdowns, minify=False, jobs=1, executor=None, chunksize=BATCH_CHUNK_SIZE):
+    # Converts an iterable of markdown strings, yielding one HTML string
+    # per input, in order: the same output as
+    # markdown_to_html_node(markdown).to_html(minify) for each. With jobs > 1
+    # chunks of chunksize strings are fanned out to jobs worker processes,
+    # at most two per worker in flight, so the input is consumed lazily. A
+    # long-running service should pass its own executor (with jobs set to
+    # its worker count) rather than pay for a new pool per batch.
+    markdowns = iter(markdowns)
+    first = list(itertools.islice(markdowns, chunksize))
+    if len(first) < chunksize or (jobs <= 1 and executor is None):
+        yield from iter_html_batch(itertools.chain(first, markdowns), minify)
+        return
+    chunks = itertools.chain([first], iter(lambda: list(itertools.islice(markdowns, chunksize)), []))
+    owned = executor is None
+    if owned:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        window = max(jobs, 1) * 2
+        pending = deque(executor.submit(convert_chunk, chunk, minify) for chunk in itertools.islice(chunks, window))
+        while pending:
+            results = pending.popleft().result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(executor.submit(convert_chunk, chunk, minify))
+            yield from results
+    finally:
+        if owned:
+            executor.shutdown(cancel_futures=True)
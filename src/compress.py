@@ -0,0 +1,134 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from instrument import logger
+from manifest import GENERATOR_VERSION, hash_file, load_manifest, save_manifest
+from static_sync import list_static_files, remove_stale
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESS_MANIFEST_PATH = "./.build_cache/compress_manifest.json"
+DEFAULT_COMPRESS_JOBS = os.cpu_count() or 1
+COMPRESSIBLE_SUFFIXES = {".html", ".css", ".js", ".json", ".xml", ".svg", ".txt", ".map"}
+
+
+def gzip_bytes(data):
+    # mtime=0 keeps the output identical for identical input.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def available_encoders():
+    # Suffix -> compress function. gzip is always there; brotli and zstd
+    # are used when their modules are installed.
+    encoders = {".gz": gzip_bytes}
+    if brotli is not None:
+        encoders[".br"] = lambda data: brotli.compress(data, quality=11)
+    if zstandard is not None:
+        encoders[".zst"] = zstandard.ZstdCompressor(level=19).compress
+    return encoders
+
+
+def is_compressible(relative):
+    return os.path.splitext(relative)[1] in COMPRESSIBLE_SUFFIXES
+
+
+def write_variant(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def compress_file(path, encoders):
+    # Writes one variant per encoder next to path (index.html.gz, ...) and
+    # gives each the original's mtime, which is what nginx's gzip_static
+    # reports as Last-Modified.
+    with open(path, "rb") as f:
+        data = f.read()
+    stat = os.stat(path)
+    for suffix, compress in encoders.items():
+        write_variant(path + suffix, compress(data))
+        os.utime(path + suffix, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def compressed_variants(docs_dir, manifest_path=COMPRESS_MANIFEST_PATH):
+    # Paths of the variants the last compress_outputs run wrote, and the
+    # manifest itself, so a missing manifest counts as missing output.
+    manifest = load_manifest(manifest_path, "files", GENERATOR_VERSION)
+    if manifest is None:
+        return [manifest_path]
+    variants = [os.path.join(docs_dir, relative + suffix) for relative in manifest["files"] for suffix in manifest["encodings"]]
+    return [manifest_path] + variants
+
+
+def remove_compressed_outputs(docs_dir, manifest_path=COMPRESS_MANIFEST_PATH):
+    # Undoes compress_outputs for a build without compression: removes every
+    # variant the last run wrote, and its manifest. Returns how many were
+    # removed.
+    manifest = load_manifest(manifest_path, "files", GENERATOR_VERSION)
+    removed = 0
+    if manifest is not None:
+        removed = remove_stale(docs_dir, [relative + suffix for relative in manifest["files"] for suffix in manifest["encodings"]])
+        logger.info(f"Removed {removed} compressed file(s)")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    return removed
+
+
+def compress_outputs(docs_dir, manifest_path=COMPRESS_MANIFEST_PATH, jobs=DEFAULT_COMPRESS_JOBS, encoders=None):
+    # Writes compressed variants of every text file under docs_dir. A file
+    # is skipped when its size and mtime, or failing that its content hash,
+    # match the last run and its variants still exist; variants of files
+    # that are gone are removed. zlib, brotli and zstd release the GIL while
+    # compressing, so a thread pool is enough to use every core.
+    if encoders is None:
+        encoders = available_encoders()
+    manifest = load_manifest(manifest_path, "files", GENERATOR_VERSION)
+    previous = manifest["files"] if manifest is not None and manifest.get("encodings") == sorted(encoders) else {}
+
+    files = {}
+    to_compress = []
+    for relative, stat in list_static_files(docs_dir).items():
+        if not is_compressible(relative):
+            continue
+        path = os.path.join(docs_dir, relative)
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": None}
+        old_entry = previous.get(relative)
+        current = old_entry is not None and all(os.path.exists(path + suffix) for suffix in encoders)
+        if current and (old_entry["size"], old_entry["mtime_ns"]) == (entry["size"], entry["mtime_ns"]):
+            entry["hash"] = old_entry["hash"]
+        else:
+            entry["hash"] = hash_file(path)
+            if not current or entry["hash"] != old_entry["hash"]:
+                to_compress.append(path)
+        files[relative] = entry
+
+    def compress_one(path):
+        compress_file(path, encoders)
+        logger.debug(f"Compressed {path}")
+
+    if jobs > 1 and len(to_compress) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(compress_one, to_compress))
+    else:
+        for path in to_compress:
+            compress_one(path)
+
+    stale = [relative + suffix for relative in previous if relative not in files for suffix in encoders]
+    removed = remove_stale(docs_dir, stale)
+    save_manifest(
+        {"version": GENERATOR_VERSION, "encodings": sorted(encoders), "files": files},
+        manifest_path,
+    )
+    skipped = len(files) - len(to_compress)
+    logger.info(f"Compressed {len(to_compress)} file(s) as {', '.join(sorted(encoders))}, {skipped} unchanged, removed {removed}")
+    return len(to_compress), skipped, removed
@@ -0,0 +1,106 @@
+import json
+import os
+from manifest import generator_version, hash_bytes
+
+
+CACHE_DIR = "./.build_cache/documents"
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# Site-absolute URLs are rendered with their path between two of these
+# markers, so one cached body serves every basepath and asset map: the body
+# is stored split on the marker, and every second part (a path) is joined
+# back in with the real basepath and fingerprinted name.
+BASEPATH_MARKER = "\x00basepath\x00"
+
+
+def marker_resolver(url):
+    if url and url.startswith("/") and not url.startswith("//"):
+        return f"{BASEPATH_MARKER}{url[1:]}{BASEPATH_MARKER}"
+    return url
+
+
+class DocumentCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = generator_version()
+
+
+    def key(self, markdown, variant=""):
+        # variant tells apart renderings of the same markdown, e.g. minified.
+        return hash_bytes(f"{self.version}\0{variant}\0".encode() + markdown.encode())
+
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+
+    def get(self, key):
+        # Returns the cached entry or None. A hit bumps the file's mtime,
+        # which is what prune() uses as the LRU order.
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+
+    def put(self, key, entry):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+
+    def prune(self):
+        # Deletes least recently used entries until the cache fits in
+        # max_bytes. Run once per build rather than on every put.
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+
+    def __repr__(self):
+        return f"DocumentCache({self.directory}, {self.max_bytes})"
+
+
+def make_entry(title, metadata, body_html, description=None):
+    return {
+        "title": title,
+        "description": description,
+        "metadata": metadata,
+        "body": body_html.split(BASEPATH_MARKER),
+    }
+
+
+def entry_body(entry, basepath, assets=None):
+    parts = entry["body"]
+    if len(parts) == 1:
+        return parts[0]
+    if assets is None:
+        assets = {}
+    body = parts[:]
+    for i in range(1, len(body), 2):
+        body[i] = basepath + assets.get(body[i], body[i])
+    return "".join(body)
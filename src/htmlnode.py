@@ -1,4 +1,44 @@
+import re
+
+
+# Minified output (minify=True) leaves out what HTML doesn't need: end tags
+# of void elements and the optional ones below, quotes around attribute
+# values that don't need them, and runs of whitespace in text outside
+# preformatted elements.
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+PREFORMATTED_TAGS = {"pre", "code", "textarea", "script", "style"}
+# A </p> may be left out when the next sibling is one of these, or when the
+# p is the last child of anything but these parents.
+P_CLOSING_TAGS = {
+    "address", "article", "aside", "blockquote", "details", "div", "dl", "fieldset", "figcaption", "figure",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hgroup", "hr", "main", "menu", "nav",
+    "ol", "p", "pre", "section", "table", "ul",
+}
+P_KEEP_END_PARENTS = {"a", "audio", "del", "ins", "map", "noscript", "video"}
+UNQUOTED_VALUE_PATTERN = re.compile(r"[^\s\"'=<>`]+")
+WHITESPACE_PATTERN = re.compile(r"\s\s+|[^\S ]")
+
+
+def has_extra_whitespace(text):
+    # Substring checks are memchr-fast; most text has nothing to collapse
+    # and skips the regex entirely.
+    return "\n" in text or "  " in text or "\t" in text or "\r" in text
+
+
+def can_omit_end_tag(tag, parent_tag, next_sibling):
+    if tag == "li":
+        return next_sibling is None or next_sibling.tag == "li"
+    if tag == "p":
+        if next_sibling is None:
+            return parent_tag not in P_KEEP_END_PARENTS
+        return next_sibling.tag in P_CLOSING_TAGS
+    return False
+
+
 class HTMLNode:
+    # Subclasses declare empty __slots__ so no node carries a __dict__.
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag =None, value =None, children=None, props =None):
         self.tag = tag
         self.value = value
@@ -6,16 +46,42 @@ class HTMLNode:
         self.props = props
 
 
-    def to_html(self):
+    def to_html(self, minify=False):
+        if minify:
+            return "".join(self.iter_html(True))
+        parts = []
+        self.append_html(parts.append)
+        return "".join(parts)
+
+
+    def iter_html(self, minify=False):
         raise NotImplementedError
 
 
-    def props_to_html(self):
+    def append_html(self, append):
+        # Serializes (unminified) by calling append with each fragment, e.g.
+        # a list's append, so a caller can reuse one buffer across trees.
+        append(self.to_html())
+
+
+    def write_html(self, out, minify=False):
+        # Streams the serialized tree into anything with a write() method
+        # (an open file, io.StringIO, ...) without building the full string.
+        write = out.write
+        for fragment in self.iter_html(minify):
+            write(fragment)
+
+
+    def props_to_html(self, minify=False):
         if self.props is None:
             return ""
         props_html = ""
         for prop in self.props:
-            props_html += f' {prop}="{self.props[prop]}"'
+            value = self.props[prop]
+            if minify and UNQUOTED_VALUE_PATTERN.fullmatch(str(value)):
+                props_html += f" {prop}={value}"
+            else:
+                props_html += f' {prop}="{value}"'
         return props_html
 
 
@@ -24,16 +90,38 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
 
 
-    def to_html(self):
+    def to_html(self, minify=False):
+        if minify:
+            return self.minified_html()
         if self.value is None:
             raise ValueError("invalid HTML: no value")
         if self.tag is None:
             return self.value
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+
+
+    def minified_html(self, preformatted=False):
+        # preformatted is set when an ancestor (e.g. <pre>) keeps whitespace.
+        if self.value is None:
+            raise ValueError("invalid HTML: no value")
+        value = self.value
+        if not preformatted and self.tag not in PREFORMATTED_TAGS and has_extra_whitespace(value):
+            value = WHITESPACE_PATTERN.sub(" ", value)
+        if self.tag is None:
+            return value
+        if self.tag in VOID_TAGS:
+            return f"<{self.tag}{self.props_to_html(True)}>"
+        return f"<{self.tag}{self.props_to_html(True)}>{value}</{self.tag}>"
+
+
+    def iter_html(self, minify=False):
+        yield self.to_html(minify)
     
 
     def __repr__(self):
@@ -41,18 +129,90 @@ class LeafNode(HTMLNode):
     
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children=None, props=None):
         super().__init__(tag, None, children, props)
 
 
-    def to_html(self):
+    def check(self):
         if self.tag is None:
             raise ValueError("invalid Tag: no value")
         if self.children is None:
             raise ValueError("invalid Children: no value")
-        open_tag = f"<{self.tag}{self.props_to_html()}>"
-        closing_tag = f"</{self.tag}>"
-        result = ""
-        for child in self.children:
-            result = result + child.to_html()
-        return open_tag + result + closing_tag
+
+
+    def iter_html(self, minify=False):
+        # Walks the tree with an explicit stack instead of recursing, so
+        # deep trees don't hit the recursion limit and every fragment is
+        # yielded exactly once instead of being re-concatenated per level.
+        if minify:
+            yield from self.iter_minified_html()
+            return
+        self.check()
+        yield f"<{self.tag}{self.props_to_html()}>"
+        stack = [(self, iter(self.children))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if isinstance(child, ParentNode):
+                    child.check()
+                    yield f"<{child.tag}{child.props_to_html()}>"
+                    stack.append((child, iter(child.children)))
+                    break
+                yield from child.iter_html()
+            else:
+                stack.pop()
+                yield f"</{node.tag}>"
+
+
+    def append_html(self, append):
+        # iter_html's walk without a generator frame per leaf.
+        self.check()
+        append(f"<{self.tag}{self.props_to_html()}>")
+        stack = [(self, iter(self.children))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if isinstance(child, ParentNode):
+                    child.check()
+                    append(f"<{child.tag}{child.props_to_html()}>")
+                    stack.append((child, iter(child.children)))
+                    break
+                append(child.to_html())
+            else:
+                stack.pop()
+                append(f"</{node.tag}>")
+
+
+    def iter_minified_html(self, parent_tag=None, next_sibling=None):
+        # Same walk, but children are visited by index so a node's next
+        # sibling is known when its end tag is due. The root's own end tag
+        # is only left out when the caller says what follows it.
+        self.check()
+        yield f"<{self.tag}{self.props_to_html(True)}>"
+        stack = [[self, 0, self.tag in PREFORMATTED_TAGS]]
+        while stack:
+            frame = stack[-1]
+            node, index, preformatted = frame
+            if index < len(node.children):
+                child = node.children[index]
+                frame[1] = index + 1
+                if isinstance(child, ParentNode):
+                    child.check()
+                    yield f"<{child.tag}{child.props_to_html(True)}>"
+                    stack.append([child, 0, preformatted or child.tag in PREFORMATTED_TAGS])
+                elif isinstance(child, LeafNode):
+                    yield child.minified_html(preformatted)
+                else:
+                    yield from child.iter_html(True)
+                continue
+            stack.pop()
+            if stack:
+                parent, index, _ = stack[-1]
+                following = parent.children[index] if index < len(parent.children) else None
+                if can_omit_end_tag(node.tag, parent.tag, following):
+                    continue
+            elif parent_tag is not None and can_omit_end_tag(node.tag, parent_tag, next_sibling):
+                continue
+            yield f"</{node.tag}>"
@@ -0,0 +1,165 @@
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from instrument import logger
+from manifest import GENERATOR_VERSION, hash_file, load_manifest, save_manifest
+from static_sync import list_static_files, remove_stale
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+IMAGE_MANIFEST_PATH = "./.build_cache/image_manifest.json"
+DEFAULT_IMAGE_JOBS = os.cpu_count() or 1
+# Widths of the resized variants; only those narrower than the original
+# are generated.
+IMAGE_WIDTHS = (480, 960, 1440)
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(f):
+    # Walks the marker segments up to the first start-of-frame, which holds
+    # the dimensions.
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        while marker[1:] == b"\xff":
+            marker = marker[1:] + f.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker[1] in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def image_size(path):
+    # (width, height) read from the file header, so dimensions are known
+    # without decoding the image or having Pillow installed. None for
+    # formats it doesn't recognise.
+    with open(path, "rb") as f:
+        head = f.read(30)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+            return None
+        if head.startswith(b"\xff\xd8"):
+            return jpeg_size(f)
+    return None
+
+
+def variant_name(relative, width, digest):
+    # "images/tom.png" -> "images/tom-480w.3f2a9b1c0d.png". The source hash
+    # in the name means a variant never has to be invalidated in place.
+    stem, suffix = os.path.splitext(relative)
+    return f"{stem}-{width}w.{digest[:10]}{suffix}"
+
+
+def resize_image(task):
+    # Runs in a worker process.
+    source_path, dest_path, width = task
+    with Image.open(source_path) as image:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        tmp_path = dest_path + ".tmp"
+        resized.save(tmp_path, format=image.format, optimize=True)
+        os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def process_images(static_dir, docs_dir, manifest_path=IMAGE_MANIFEST_PATH, jobs=DEFAULT_IMAGE_JOBS, widths=IMAGE_WIDTHS):
+    # Returns the image map: static path -> {"width", "height", "variants"},
+    # where variants is a list of [width, path] for the resized copies
+    # written to docs_dir. Entries are cached by source hash (checked only
+    # when the size or mtime changed), so an unchanged image costs a stat.
+    # Resizing needs Pillow; without it images still get their dimensions.
+    manifest = load_manifest(manifest_path, "files", GENERATOR_VERSION)
+    resize = Image is not None
+    settings = {"widths": list(widths), "resize": resize}
+    previous = manifest["files"] if manifest is not None and manifest.get("settings") == settings else {}
+
+    images = {}
+    tasks = []
+    for relative, stat in list_static_files(static_dir).items():
+        if os.path.splitext(relative)[1].lower() not in IMAGE_SUFFIXES:
+            continue
+        path = os.path.join(static_dir, relative)
+        old_entry = previous.get(relative)
+        if old_entry is not None and (old_entry["size"], old_entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            digest = old_entry["hash"]
+        else:
+            digest = hash_file(path)
+        entry = old_entry if old_entry is not None and old_entry["hash"] == digest else None
+        if entry is None:
+            size = image_size(path)
+            if size is None:
+                logger.warning(f"Could not read the dimensions of {path}, leaving it as is")
+                continue
+            width, height = size
+            entry = {"hash": digest, "width": width, "height": height, "variants": []}
+            if resize:
+                entry["variants"] = [[w, variant_name(relative, w, digest)] for w in widths if w < width]
+        entry = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        for w, name in entry["variants"]:
+            dest_path = os.path.join(docs_dir, name)
+            if not os.path.exists(dest_path):
+                tasks.append((path, dest_path, w))
+        images[relative] = entry
+
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(resize_image, tasks))
+    else:
+        for task in tasks:
+            resize_image(task)
+
+    outputs = {name for entry in images.values() for _, name in entry["variants"]}
+    stale = [name for entry in previous.values() for _, name in entry["variants"] if name not in outputs]
+    removed = remove_stale(docs_dir, stale)
+    save_manifest({"version": GENERATOR_VERSION, "settings": settings, "files": images}, manifest_path)
+    if not resize:
+        logger.info("Pillow is not installed, images get their dimensions but no resized variants")
+    logger.info(f"Images: {len(images)} found, wrote {len(tasks)} variant(s), removed {removed}")
+    return {
+        relative: {"width": entry["width"], "height": entry["height"], "variants": entry["variants"]}
+        for relative, entry in images.items()
+    }
+
+
+def image_resolver(images, resolve_url):
+    # Returns the resolve_image hook for text_node_to_html_node: the extra
+    # <img> props for a (not yet resolved) site-absolute src, or None when
+    # the image map doesn't know it.
+    def resolve_image(src):
+        if not src or not src.startswith("/"):
+            return None
+        image = images.get(src[1:])
+        if image is None:
+            return None
+        props = {"width": str(image["width"]), "height": str(image["height"])}
+        if image["variants"]:
+            candidates = [f"{resolve_url('/' + name)} {width}w" for width, name in image["variants"]]
+            candidates.append(f"{resolve_url(src)} {image['width']}w")
+            props["srcset"] = ", ".join(candidates)
+            props["sizes"] = f"(max-width: {image['width']}px) 100vw, {image['width']}px"
+        props["loading"] = "lazy"
+        return props
+    return resolve_image
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger("site_generator")
+
+STAGES = [
+    "discovery",
+    "static_copy",
+    "images",
+    "index",
+    "read",
+    "cache",
+    "block_split",
+    "inline_parse",
+    "tree_build",
+    "serialize",
+    "template",
+    "write",
+    "listings",
+    "search",
+    "links",
+    "compress",
+]
+REPORT_PATH = "./.build_cache/build_report.json"
+
+
+def configure_logging(level):
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def add_timing(timings, stage, start):
+    # Adds the time since start to timings[stage] and returns "now", so
+    # consecutive stages can be chained off a single perf_counter() call.
+    now = time.perf_counter()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+
+class BuildStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.pages = {}
+        # Event counts that aren't timings, e.g. inline cache hits.
+        self.counters = {}
+        # Pipeline stages running in parallel add to the same totals.
+        self.lock = threading.Lock()
+
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+
+
+    def add_counts(self, counts):
+        with self.lock:
+            for name, count in counts.items():
+                self.counters[name] = self.counters.get(name, 0) + count
+
+
+    def add_page(self, source, timings):
+        self.pages[str(source)] = timings
+        for stage, seconds in timings.items():
+            self.add(stage, seconds)
+
+
+    def report(self, slowest=20):
+        page_totals = sorted(
+            ((sum(timings.values()), source) for source, timings in self.pages.items()),
+            reverse=True,
+        )
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "pages": len(self.pages),
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.totals.items()},
+            "counters": dict(self.counters),
+            "slowest_pages": [
+                {
+                    "source": source,
+                    "seconds": round(total, 6),
+                    "stages": {stage: round(seconds, 6) for stage, seconds in self.pages[source].items()},
+                }
+                for total, source in page_totals[:slowest]
+            ],
+        }
+
+
+    def write_report(self, path=REPORT_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+        return report
+
+
+    def __repr__(self):
+        return f"BuildStats({len(self.pages)} pages, {self.totals})"
@@ -0,0 +1,86 @@
+import posixpath
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+from instrument import logger
+from site_index import page_url
+
+
+LINKS_PATH = "./.build_cache/page_links.json"
+
+
+def link_recorder(resolve_url, links):
+    # Wraps a resolve_url hook so every URL it is asked to resolve (each
+    # link href and image src, as its node is built) is added to the links
+    # set. The URLs are recorded as written in the markdown, before the
+    # basepath and asset names are applied.
+    def record_url(url):
+        links.add(url)
+        return resolve_url(url)
+    return record_url
+
+
+def site_targets(index, static_files):
+    # Every site-absolute path a link may point at: the pages and listings
+    # of the site index (also without the trailing slash or .html, and as
+    # .../index.html) and the static files.
+    targets = {"/" + relative for relative in static_files}
+    urls = [entry["url"] for entry in index["pages"].values()]
+    urls += [page_url(output) for output in index.get("listings", {})]
+    for url in urls:
+        targets.add(url)
+        if url.endswith("/"):
+            targets.add(url + "index.html")
+            if url != "/":
+                targets.add(url[:-1])
+        elif url.endswith(".html"):
+            targets.add(url[:-5])
+    return targets
+
+
+def link_path(url, source_url):
+    # The site-absolute path url points at from the page at source_url, or
+    # None for links that aren't checked: external URLs (anything with a
+    # scheme or host) and same-page anchors.
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if not path.startswith("/"):
+        path = posixpath.join(posixpath.dirname(source_url), path)
+    normalized = posixpath.normpath(path)
+    if path.endswith("/") and normalized != "/":
+        normalized += "/"
+    return normalized
+
+
+def find_broken_links(index, links, static_files, docs_path):
+    # links maps a page's path relative to content/ to the URLs it links
+    # to. Each one is a set lookup; only a miss (e.g. a link to a file a
+    # later stage generated, like sitemap.xml) falls back to checking
+    # docs_path. Returns the sorted (page, url) pairs that lead nowhere.
+    targets = site_targets(index, static_files)
+    docs_path = Path(docs_path)
+    broken = []
+    for relative_path, urls in links.items():
+        entry = index["pages"].get(relative_path)
+        if entry is None:
+            continue
+        for url in urls:
+            path = link_path(url, entry["url"])
+            if path is None or path in targets:
+                continue
+            output = docs_path / path.lstrip("/")
+            if output.is_file() or (output / "index.html").is_file():
+                continue
+            broken.append((relative_path, url))
+    return sorted(broken)
+
+
+def report_broken_links(broken):
+    for relative_path, url in broken:
+        logger.warning(f"Broken link in {relative_path}: {url}")
+    pages = len({relative_path for relative_path, _ in broken})
+    if broken:
+        logger.warning(f"Found {len(broken)} broken link(s) on {pages} page(s)")
+    else:
+        logger.info("No broken links found")
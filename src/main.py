@@ -1,50 +1,69 @@
 import shutil
 import os
 import sys
-from block_splitter import markdown_to_blocks, markdown_to_html_node
+import argparse
+import io
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+import node_splitter
+from block_splitter import StreamedDocument, inline_cache_counts, iter_blocks, markdown_to_page, scan_page
 from htmlnode import *
 from pathlib import Path
+from linkcheck import LINKS_PATH, find_broken_links, link_recorder, report_broken_links
+from instrument import REPORT_PATH, BuildStats, add_timing, configure_logging, logger
+from assets import assets_hash, sync_assets
+from compress import DEFAULT_COMPRESS_JOBS, available_encoders, compress_outputs, compressed_variants, remove_compressed_outputs
+from images import DEFAULT_IMAGE_JOBS, image_resolver, process_images
+from page_io import DEFAULT_IO_BUFFER, DEFAULT_IO_JOBS, PageWriter, atomic_open, prefetch
+from doc_cache import BASEPATH_MARKER, CACHE_DIR, DocumentCache, entry_body, make_entry, marker_resolver
+from pipeline import PIPELINE_STATE_PATH, DeferredFailure, Pipeline, Stage
+from search import SEARCH_DIR, TERMS_PATH, add_node_terms, page_terms, write_search_index
+from site_index import INDEX_PATH, SITEMAP_NAME, build_site_index, load_site_index, save_site_index, write_listings, write_sitemap
+from static_sync import DEFAULT_SYNC_JOBS, list_static_files, sync_static
+from template import Template, basepath_resolver, load_template, split_front_matter, split_front_matter_lines, text_values
+from manifest import (
+    MANIFEST_PATH,
+    hash_bytes,
+    hash_file,
+    is_page_current,
+    load_manifest,
+    new_manifest,
+    page_entry,
+    save_manifest,
+)
 
 
-def copy_static_to_public(source_path, dest_path):
-    if not os.path.exists(dest_path):
-        os.mkdir(dest_path)
-        print(f"Created directory: {dest_path}")
+# Markdown files at least this big (in MB) are converted block by block
+# instead of being read into memory whole.
+DEFAULT_STREAM_THRESHOLD = 64
 
-    items = os.listdir(source_path)
 
-    for item in items:
-        source_item_path = os.path.join(source_path, item)
-        dest_item_path = os.path.join(dest_path, item)
-
-        if os.path.isfile(source_item_path):
-            shutil.copy(source_item_path, dest_item_path)
-            print(f"Copied file: {source_item_path} -> {dest_item_path}")
-        else:
-            copy_static_to_public(source_item_path, dest_item_path)
-
-
-def get_files_ready(script_dir):
+def get_files_ready(script_dir, clean=True, checksum=False, hardlink=False, jobs=DEFAULT_SYNC_JOBS, fingerprint=False):
+    # With fingerprint, static files are copied under content-hashed names
+    # and the asset map (static path -> fingerprinted path) is returned;
+    # otherwise the map is empty.
     docs_dir = "./docs"
     static_dir = "./static"
-    if os.path.exists(docs_dir):
+    if clean and os.path.exists(docs_dir):
         shutil.rmtree(docs_dir)
-        print("Content in docs dictionary was deleted!")
-    os.mkdir(docs_dir)
+        logger.debug("Content in docs dictionary was deleted!")
+    os.makedirs(docs_dir, exist_ok=True)
     if not os.path.exists(static_dir):
-        print("Error: Static directory not found!")
-        return
-    print(f"This is what the static file destination is: {static_dir}")
-    copy_static_to_public(static_dir, docs_dir)
+        logger.warning("Error: Static directory not found!")
+        return {}
+    logger.debug(f"This is what the static file destination is: {static_dir}")
+    if fingerprint:
+        return sync_assets(static_dir, docs_dir, checksum=checksum, hardlink=hardlink, jobs=jobs)
+    sync_static(static_dir, docs_dir, checksum=checksum, hardlink=hardlink, jobs=jobs)
+    return {}
 
 
-def extract_title(markdown):
-    markdown_blocked = markdown_to_blocks(markdown)
-    for block in markdown_blocked:
-        if block.startswith('# '):
-            stripped_string = block[2:].strip()
-            return stripped_string
-    raise Exception("No h1 was provided")
+def page_title(result):
+    # result is a PageResult; pages without an h1 can't be built.
+    if result.title is None:
+        raise Exception("No h1 was provided")
+    return result.title
 
 # Create a generate_page(from_path, template_path, dest_path) function. It should:
 
@@ -85,63 +104,726 @@ def extract_title(markdown):
 #         print(dest_path + " " + "was made")
     
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    print(f"Checking if {dir_path_content} exists...")
+def find_markdown_files(dir_path_content):
+    content_path = Path(dir_path_content)
+    return sorted(item for item in content_path.rglob("*.md") if item.is_file())
+
+
+def page_resolvers(template, resolve_url=None, links=None):
+    # The (resolve_url, resolve_image) hooks pages are converted with;
+    # resolve_url defaults to the template's basepath and asset map. With a
+    # links set, the URLs of the page's links and images are added to it.
+    if resolve_url is None:
+        resolve_url = basepath_resolver(template.basepath, template.assets)
+    resolve_image = image_resolver(template.images, resolve_url) if template.images else None
+    if links is not None:
+        resolve_url = link_recorder(resolve_url, links)
+    return resolve_url, resolve_image
+
+
+def page_values(markdown, template, timings=None, cache=None, terms=None, links=None):
+    # template is a compiled Template, which already carries the basepath.
+    # When a terms set is passed, the page's search terms are added to it,
+    # and a links set gets the URLs the page links to.
+    if cache is not None and BASEPATH_MARKER not in markdown:
+        return cached_page_values(markdown, template, timings, cache, terms, links)
+    metadata, markdown = split_front_matter(markdown)
+    resolve_url, resolve_image = page_resolvers(template, links=links)
+    result = markdown_to_page(markdown, resolve_url, timings, resolve_image)
+    if terms is not None:
+        start = time.perf_counter()
+        add_node_terms(result.node, terms)
+        add_timing(timings, "search", start)
+    values = text_values(metadata, page_title(result), result.description)
+    values["content"] = result.node
+    return values
+
+
+def cached_page_values(markdown, template, timings, cache, terms=None, links=None):
+    # Like page_values, but the rendered body and title come from the
+    # document cache when this exact markdown was converted before, so a
+    # template or basepath change never re-runs the markdown pipeline.
+    start = time.perf_counter()
+    key = cache.key(markdown, ("minified" if template.minify else "") + template.images_hash)
+    entry = cache.get(key)
+    add_timing(timings, "cache", start)
+    if entry is None:
+        metadata, body = split_front_matter(markdown)
+        page_links = set()
+        resolve_url, resolve_image = page_resolvers(template, marker_resolver, page_links)
+        result = markdown_to_page(body, resolve_url, timings, resolve_image)
+        start = time.perf_counter()
+        entry = make_entry(page_title(result), metadata, result.node.to_html(template.minify), result.description)
+        start = add_timing(timings, "serialize", start)
+        # Entries always carry the search terms and links, so turning on
+        # --search or --check-links doesn't invalidate the cache.
+        entry["terms"] = page_terms(result.node)
+        entry["links"] = sorted(page_links)
+        start = add_timing(timings, "search", start)
+        cache.put(key, entry)
+        add_timing(timings, "cache", start)
+    if terms is not None:
+        terms.update(entry["terms"])
+    if links is not None:
+        links.update(entry["links"])
+    values = text_values(entry["metadata"], entry["title"], entry["description"])
+    values["content"] = entry_body(entry, template.basepath, template.assets)
+    return values
+
+
+def render_page(markdown, template):
+    return template.render(page_values(markdown, template))
+
+
+def write_page(output_path, template, values, timings=None, writer=None):
+    # "write" is everything render_to doesn't account for itself: creating
+    # directories, opening the file and the final flush on close. Pages are
+    # written through a temporary file, so docs/ never holds a half-written
+    # one. With a PageWriter the page is rendered into memory and handed to
+    # it, and "write" is only the time spent waiting for room in its queue.
+    start = time.perf_counter()
+    before = sum(timings.values()) if timings is not None else 0.0
+    if writer is not None:
+        buffer = io.StringIO()
+        template.render_to(buffer, values, timings)
+        writer.write(str(output_path), buffer.getvalue())
+    else:
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(output_path) as f:
+            template.render_to(f, values, timings)
+    if timings is not None:
+        add_timing(timings, "write", start + sum(timings.values()) - before)
+
+
+def write_streamed_page(source, output_path, template, timings=None, terms=None, links=None):
+    # For sources too big to hold in memory. The title is needed before the
+    # body is written, so a first read stops once the title and description
+    # are known and a second read converts and writes the body one block at
+    # a time.
+    start = time.perf_counter()
+    with open(source) as f:
+        metadata, lines = split_front_matter_lines(f)
+        result = scan_page(iter_blocks(lines))
+    values = text_values(metadata, page_title(result), result.description)
+    add_timing(timings, "read", start)
+    with open(source) as f:
+        _, lines = split_front_matter_lines(f)
+        resolve_url, resolve_image = page_resolvers(template, links=links)
+        values["content"] = StreamedDocument(lines, resolve_url, timings, terms, resolve_image)
+        write_page(output_path, template, values, timings)
+
+
+class BuildError(Exception):
+    def __init__(self, failures):
+        self.failures = failures
+        details = "\n".join(f"  {source}: {error}" for source, error in failures)
+        super().__init__(f"{len(failures)} page(s) failed to build:\n{details}")
+
+
+def read_source(source, stream_threshold=None):
+    # The markdown of source, or None when it is big enough to be streamed.
+    if stream_threshold is not None and os.path.getsize(source) >= stream_threshold:
+        return None
+    with open(source) as ipath:
+        return ipath.read()
+
+
+def render_page_task(task, read=None, writer=None):
+    # Returns (error, timings, counts, terms, links); error is None when the
+    # page was written, counts holds the page's inline cache hits and
+    # misses, terms is the sorted list of search terms when search is set
+    # and links the sorted list of linked URLs when check_links is. read
+    # returns the page's markdown (see read_source), e.g. from a prefetched
+    # future, and writer is passed on to write_page.
+    source, output_path, template, cache, stream_threshold, search, check_links = task
+    timings = {}
+    before = inline_cache_counts()
+    terms = set() if search else None
+    links = set() if check_links else None
+    try:
+        start = time.perf_counter()
+        read_mark = read() if read is not None else read_source(source, stream_threshold)
+        add_timing(timings, "read", start)
+        if read_mark is None:
+            write_streamed_page(source, output_path, template, timings, terms, links)
+        else:
+            write_page(output_path, template, page_values(read_mark, template, timings, cache, terms, links), timings, writer)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    else:
+        error = None
+    counts = {name: count - before[name] for name, count in inline_cache_counts().items()}
+    if error is not None:
+        return error, timings, counts, None, None
+    return None, timings, counts, sorted(terms) if search else None, sorted(links) if check_links else None
+
+
+def render_pages_overlapped(tasks, io_jobs=DEFAULT_IO_JOBS, io_buffer=DEFAULT_IO_BUFFER):
+    # Renders in this process while io_jobs threads read the next sources
+    # and write finished pages, each side holding at most io_buffer MB.
+    # Returns the render_page_task results in order; a page whose write
+    # failed gets the write error.
+    max_bytes = io_buffer * 1024 * 1024
+    results = []
+    with PageWriter(io_jobs, max_bytes) as writer:
+        sources = prefetch(
+            [(task[0], task[4]) for task in tasks],
+            lambda source: read_source(*source),
+            io_jobs,
+            max_bytes,
+        )
+        for task, future in zip(tasks, sources):
+            results.append(render_page_task(task, future.result, writer))
+    positions = {task[1]: i for i, task in enumerate(tasks)}
+    for output_path, error in writer.failures:
+        _, timings, counts, _, _ = results[positions[output_path]]
+        results[positions[output_path]] = (error, timings, counts, None, None)
+    return results
+
+
+def render_pages(pages, template, jobs=1, stats=None, cache=None, stream_threshold=None, terms=None, links=None, io_jobs=0, io_buffer=DEFAULT_IO_BUFFER):
+    # pages is a list of (source, output_path). Returns the (source, error)
+    # pairs for every page that failed so the caller can report them together.
+    # Sources of at least stream_threshold bytes are streamed, not read whole.
+    # When a terms dict is passed, it maps each written source to its search
+    # terms afterwards, and a links dict to the URLs it links to. Without
+    # worker processes, io_jobs > 0 overlaps reading and writing with
+    # rendering (see render_pages_overlapped); worker processes already
+    # overlap each other's I/O.
+    search = terms is not None
+    check_links = links is not None
+    tasks = [
+        (str(source), str(output_path), template, cache, stream_threshold, search, check_links)
+        for source, output_path in pages
+    ]
+    if jobs > 1 and len(tasks) > 1:
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(render_page_task, tasks, chunksize=chunksize))
+    elif io_jobs > 0 and len(tasks) > 1:
+        results = render_pages_overlapped(tasks, io_jobs, io_buffer)
+    else:
+        results = [render_page_task(task) for task in tasks]
+    failures = []
+    for (source, _), (error, timings, counts, source_terms, source_links) in zip(pages, results):
+        logger.debug(f"Rendered {source} in {sum(timings.values()) * 1000:.1f} ms")
+        if stats is not None:
+            stats.add_page(source, timings)
+            stats.add_counts(counts)
+        if error is not None:
+            failures.append((source, error))
+            continue
+        if search:
+            terms[source] = source_terms
+        if check_links:
+            links[source] = source_links
+    return failures
+
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, template=None):
+    logger.debug(f"Checking if {dir_path_content} exists...")
     if not os.path.exists(dir_path_content):
         raise FileNotFoundError(f"Path {dir_path_content} does not exist")
-    print(f"Congrats {dir_path_content} exists! Now taking a peek at the content...")
+    logger.debug(f"Congrats {dir_path_content} exists! Now taking a peek at the content...")
+    if template is None:
+        template = load_template(template_path, basepath)
     content_path = Path(dir_path_content)
     for item in content_path.iterdir():
         if item.is_file():
             if item.suffix == ".md":
-                print(f"found a markdown file! {item} and checking if the destination file exists...")
+                logger.debug(f"found a markdown file! {item} and checking if the destination file exists...")
                 if not os.path.exists(dest_dir_path):
                     os.makedirs(dest_dir_path, exist_ok=True)
-                print("Reading tmeplate path...")
-                with open(template_path) as tpath:
-                    read_temp = tpath.read()
                 with open(item) as ipath:
                     read_mark = ipath.read()
-                print(f"Generating html file from {item}...")
-                html_content = markdown_to_html_node(read_mark).to_html()
-                print("content converted to html, now extracting title...")
-                title = extract_title(read_mark)
-                print("Putting the Title and Content in the final html file. Please wait...")
-                final_html = read_temp.replace("{{ Title }}", title).replace("{{ Content }}", html_content).replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+                logger.debug(f"Generating html file from {item}...")
+                values = page_values(read_mark, template)
                 relative_path = item.relative_to(content_path)
                 output_filename = relative_path.with_suffix('.html')
                 output_path = Path(dest_dir_path) / output_filename
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_path, 'w') as f:
-                    f.write(final_html)
+                write_page(output_path, template, values)
         elif item.is_dir():
             new_dest_dir = Path(dest_dir_path) / item.name
             new_dest_dir.mkdir(parents=True, exist_ok=True)
-            generate_pages_recursive(item, template_path, new_dest_dir, basepath)
+            generate_pages_recursive(item, template_path, new_dest_dir, basepath, template)
 
-        
-    
-        
+
+def generate_pages_parallel(dir_path_content, template_path, dest_dir_path, basepath, jobs, stats=None, cache=None, stream_threshold=None, terms=None, minify=False, assets=None, images=None, links=None, io_jobs=0, io_buffer=DEFAULT_IO_BUFFER):
+    if not os.path.exists(dir_path_content):
+        raise FileNotFoundError(f"Path {dir_path_content} does not exist")
+    start = time.perf_counter()
+    template = load_template(template_path, basepath, minify, assets, images)
+    content_path = Path(dir_path_content)
+    pages = []
+    for item in find_markdown_files(content_path):
+        output_path = Path(dest_dir_path) / item.relative_to(content_path).with_suffix('.html')
+        pages.append((item, output_path))
+    if stats is not None:
+        stats.add("discovery", time.perf_counter() - start)
+    logger.info(f"Rendering {len(pages)} page(s) with {jobs} worker(s)")
+    failures = render_pages(pages, template, jobs, stats, cache, stream_threshold, terms, links, io_jobs, io_buffer)
+    if failures:
+        raise BuildError(failures)
+
+
+def generate_pages_incremental(dir_path_content, template_path, dest_dir_path, basepath, manifest_path=MANIFEST_PATH, jobs=1, stats=None, cache=None, stream_threshold=None, terms=None, minify=False, assets=None, images=None, links=None, io_jobs=0, io_buffer=DEFAULT_IO_BUFFER):
+    if not os.path.exists(dir_path_content):
+        raise FileNotFoundError(f"Path {dir_path_content} does not exist")
+    start = time.perf_counter()
+    old_manifest = load_manifest(manifest_path)
+    if old_manifest is None:
+        logger.info("No usable build manifest found, rendering every page")
+        old_pages = {}
+    else:
+        old_pages = old_manifest["pages"]
+
+    with open(template_path) as tpath:
+        read_temp = tpath.read()
+    # Minified pages differ from plain ones for the same template, and a
+    # page's asset references and image props change with the asset and
+    # image maps.
+    template = Template(read_temp, basepath, minify, assets, images)
+    template_hash = hash_bytes(read_temp.encode() + (b"\0minify" if minify else b""))
+    if assets or images:
+        template_hash = hash_bytes(f"{template_hash}\0{assets_hash(assets)}\0{template.images_hash}".encode())
+
+    content_path = Path(dir_path_content)
+    manifest = new_manifest()
+    changed = []
+    for item in find_markdown_files(content_path):
+        relative_path = item.relative_to(content_path)
+        output_path = Path(dest_dir_path) / relative_path.with_suffix('.html')
+        entry = page_entry(hash_file(item), template_hash, basepath, output_path)
+        manifest["pages"][relative_path.as_posix()] = entry
+        if not is_page_current(old_pages.get(relative_path.as_posix()), entry):
+            changed.append((item, output_path))
+    if stats is not None:
+        stats.add("discovery", time.perf_counter() - start)
+
+    failures = render_pages(changed, template, jobs, stats, cache, stream_threshold, terms, links, io_jobs, io_buffer)
+    rendered = len(changed) - len(failures)
+    unchanged = len(manifest["pages"]) - len(changed)
+
+    # Only outputs whose source is gone are stale; a page that failed keeps
+    # its last good output.
+    removed = 0
+    for source, entry in old_pages.items():
+        if source in manifest["pages"]:
+            continue
+        if os.path.exists(entry["output"]):
+            os.remove(entry["output"])
+            removed += 1
+
+    # A failed page keeps its previous entry, which no longer matches its
+    # source, so the next build retries it and can still remove its output
+    # if the source goes away.
+    for source, _ in failures:
+        relative_path = Path(source).relative_to(content_path).as_posix()
+        if relative_path in old_pages:
+            manifest["pages"][relative_path] = old_pages[relative_path]
+        else:
+            del manifest["pages"][relative_path]
+
+    save_manifest(manifest, manifest_path)
+    logger.info(f"Rendered {rendered} page(s), {unchanged} unchanged, {len(failures)} failed, removed {removed} stale page(s)")
+    if failures:
+        raise BuildError(failures)
+    return manifest
 
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site into docs/")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only re-render pages whose source, template or basepath changed",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="render pages in N worker processes (0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--inline-parser",
+        choices=["scanner", "legacy"],
+        default=None,
+        help="inline markdown parser to use (default: scanner)",
+    )
+    parser.add_argument(
+        "--static-checksum",
+        action="store_true",
+        help="compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--static-hardlink",
+        action="store_true",
+        help="hard link static files into docs/ instead of copying them",
+    )
+    parser.add_argument(
+        "--static-jobs",
+        type=int,
+        default=DEFAULT_SYNC_JOBS,
+        metavar="N",
+        help=f"threads used to copy static files (default: {DEFAULT_SYNC_JOBS})",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"reuse rendered page bodies from {CACHE_DIR} when the markdown is unchanged",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        metavar="MB",
+        help="size limit of the document cache, least recently used entries go first (default: 256)",
+    )
+    parser.add_argument(
+        "--stream-threshold",
+        type=int,
+        default=DEFAULT_STREAM_THRESHOLD,
+        metavar="MB",
+        help="stream markdown files of at least this size instead of reading them whole, 0 streams every page "
+        f"(default: {DEFAULT_STREAM_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--io-jobs",
+        type=int,
+        default=DEFAULT_IO_JOBS,
+        metavar="N",
+        help="without --jobs, read sources and write pages on N threads while rendering, 0 does it inline "
+        f"(default: {DEFAULT_IO_JOBS})",
+    )
+    parser.add_argument(
+        "--io-buffer",
+        type=int,
+        default=DEFAULT_IO_BUFFER,
+        metavar="MB",
+        help=f"most source text read ahead, and page text queued for writing, at a time (default: {DEFAULT_IO_BUFFER})",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="write a client-side search index and its loader to docs/search/",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="write .gz (and .br/.zst when brotli/zstandard are installed) next to every text file in docs/",
+    )
+    parser.add_argument(
+        "--compress-jobs",
+        type=int,
+        default=DEFAULT_COMPRESS_JOBS,
+        metavar="N",
+        help=f"threads used to compress files (default: {DEFAULT_COMPRESS_JOBS})",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="serialize pages minified: no whitespace between block tags, optional quotes and end tags left out",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="copy static files under content-hashed names (index.3f2a9b1c0d.css) and rewrite references to them",
+    )
+    parser.add_argument(
+        "--images",
+        action="store_true",
+        help="give images width/height and loading=lazy, and resized variants in a srcset when Pillow is installed",
+    )
+    parser.add_argument(
+        "--image-jobs",
+        type=int,
+        default=DEFAULT_IMAGE_JOBS,
+        metavar="N",
+        help=f"processes used to resize images (default: {DEFAULT_IMAGE_JOBS})",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="report links and images that point at pages or files the site doesn't have",
+    )
+    parser.add_argument(
+        "--site-url",
+        default="",
+        metavar="URL",
+        help="public URL of the site (e.g. https://example.com), used for absolute links in sitemap.xml",
+    )
+    parser.add_argument(
+        "--report",
+        default=REPORT_PATH,
+        metavar="PATH",
+        help=f"where to write the JSON build report (default: {REPORT_PATH})",
+    )
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-q", "--quiet", action="store_true", help="only print warnings and errors")
+    verbosity.add_argument("-v", "--verbose", action="store_true", help="print every file as it is processed")
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error("--jobs must be 0 or a positive number")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.io_jobs < 0:
+        parser.error("--io-jobs must be 0 or a positive number")
+    return args
 
-def main():
-  if len(sys.argv) > 1:
-    basepath = sys.argv[1]
+
+def main(argv=None):
+  args = parse_args(sys.argv[1:] if argv is None else argv)
+  if args.quiet:
+    configure_logging(logging.WARNING)
+  elif args.verbose:
+    configure_logging(logging.DEBUG)
   else:
-    basepath = '/'
+    configure_logging(logging.INFO)
+  basepath = args.basepath
+  if args.inline_parser is not None:
+    # Set through the environment as well so worker processes pick it up.
+    os.environ["SITE_GENERATOR_INLINE_PARSER"] = args.inline_parser
+    node_splitter.INLINE_PARSER = args.inline_parser
 
-  print(f"This is what the basepath is: {basepath}")  
+  logger.info(f"This is what the basepath is: {basepath}")  
   script_dir = os.path.dirname(os.path.abspath(__file__))  
-  get_files_ready(script_dir)
   content_path = "./content"
   template_path = "./template.html"
   docs_path = "./docs"
-  generate_pages_recursive(content_path, template_path, docs_path, basepath)  
-    
-    
+  stats = BuildStats()
+  try:
+    build(args, script_dir, content_path, template_path, docs_path, stats)
+  except BuildError as e:
+    logger.error(str(e))
+    sys.exit(1)
+  finally:
+    report_build(stats, args.report)
+
+
+def build(args, script_dir, content_path, template_path, docs_path, stats):
+    # The build is a graph of stages (see build_stages); independent ones run
+    # concurrently and, in incremental builds, stages whose inputs didn't
+    # change since the last build are skipped.
+    clean = not args.incremental or load_manifest() is None
+    if clean:
+        if os.path.exists(docs_path):
+            shutil.rmtree(docs_path)
+            logger.debug("Content in docs dictionary was deleted!")
+        # A full build doesn't record what it rendered, so the state of the
+        # last incremental build no longer describes docs/.
+        for state_path in (MANIFEST_PATH, PIPELINE_STATE_PATH):
+            if os.path.exists(state_path):
+                os.remove(state_path)
+    os.makedirs(docs_path, exist_ok=True)
+    if not args.compress:
+        # Variants left by an earlier build with --compress would go on
+        # being served for pages this build changes or removes.
+        remove_compressed_outputs(docs_path)
+    pipeline = Pipeline(build_stages(args, script_dir, content_path, template_path, docs_path, stats))
+    results, skipped = pipeline.run(stats, reuse=not clean)
+    if skipped:
+        logger.info(f"Skipped {len(skipped)} unchanged stage(s): {', '.join(skipped)}")
+    if "links" in results:
+        report_broken_links([tuple(pair) for pair in results["links"]])
+
+
+def build_stages(args, script_dir, content_path, template_path, docs_path, stats):
+    basepath = args.basepath
+    static_dir = "./static"
+    # Filled by the render stage for the pages it renders; a skipped render
+    # leaves them empty and the search and link stages use their saved data.
+    terms = {} if args.search else None
+    links = {} if args.check_links else None
+    page_inputs = []
+    stages = []
+
+    def static_copy(inputs):
+        assets = get_files_ready(script_dir, False, args.static_checksum, args.static_hardlink, args.static_jobs, args.fingerprint)
+        files = list_static_files(static_dir) if os.path.exists(static_dir) else {}
+        return {"assets": assets, "outputs": sorted(assets.get(relative, relative) for relative in files)}
+
+    stages.append(Stage(
+        "static_copy", static_copy, paths=[static_dir],
+        params={"fingerprint": args.fingerprint, "hardlink": args.static_hardlink},
+        outputs=lambda result: [os.path.join(docs_path, output) for output in result["outputs"]],
+    ))
+    if args.fingerprint:
+        # Pages and listings need the asset map; otherwise rendering doesn't
+        # wait for the static copy.
+        page_inputs.append("static_copy")
+
+    if args.images:
+        def images(inputs):
+            return process_images(static_dir, docs_path, jobs=args.image_jobs) if os.path.exists(static_dir) else {}
+
+        stages.append(Stage(
+            "images", images, paths=[static_dir],
+            outputs=lambda result: [os.path.join(docs_path, name) for image in result.values() for _, name in image["variants"]],
+        ))
+        page_inputs.append("images")
+
+    def page_maps(inputs):
+        assets = inputs["static_copy"]["assets"] if "static_copy" in inputs else None
+        return assets, inputs.get("images")
+
+    def index_stage(inputs):
+        # A metadata-only pass over content/ for the listings, sitemap and
+        # search index.
+        index, read = build_site_index(content_path, load_site_index())
+        logger.info(f"Indexed {len(index['pages'])} page(s), {read} re-read")
+        return index
+
+    stages.append(Stage("index", index_stage, paths=[content_path]))
+
+    def render(inputs):
+        assets, images = page_maps(inputs)
+        cache = DocumentCache(max_bytes=args.cache_size * 1024 * 1024) if args.cache else None
+        stream_threshold = args.stream_threshold * 1024 * 1024
+        try:
+            if args.incremental:
+                generate_pages_incremental(content_path, template_path, docs_path, basepath, jobs=args.jobs, stats=stats, cache=cache, stream_threshold=stream_threshold, terms=terms, minify=args.minify, assets=assets, images=images, links=links, io_jobs=args.io_jobs, io_buffer=args.io_buffer)
+            else:
+                generate_pages_parallel(content_path, template_path, docs_path, basepath, args.jobs, stats, cache, stream_threshold, terms, args.minify, assets, images, links, args.io_jobs, args.io_buffer)
+        except BuildError as e:
+            # Pages that rendered are written; the stage runs again next build.
+            raise DeferredFailure(None, e)
+        finally:
+            if cache is not None:
+                cache.prune()
+
+    stages.append(Stage(
+        "render", render, inputs=page_inputs, paths=[content_path, template_path],
+        params={"basepath": basepath, "minify": args.minify, "search": args.search, "links": args.check_links},
+        outputs=lambda result: [MANIFEST_PATH] + [entry["output"] for entry in (load_manifest() or {"pages": {}})["pages"].values()],
+        timed=False,
+    ))
+
+    def listings(inputs):
+        assets, images = page_maps(inputs)
+        # A copy, so the index stage's result isn't changed under it.
+        index = dict(inputs["index"], listings={})
+        write_site_pages(index, load_site_index(), load_template(template_path, basepath, args.minify, assets, images), docs_path, args.site_url)
+        return {"listings": sorted(index["listings"])}
+
+    stages.append(Stage(
+        "listings", listings, inputs=["index"] + page_inputs, paths=[template_path],
+        params={"basepath": basepath, "minify": args.minify, "site_url": args.site_url},
+        outputs=lambda result: [os.path.join(docs_path, output) for output in result["listings"] + [SITEMAP_NAME]],
+    ))
+    written = ["render", "listings"]
+
+    if args.search:
+        def search(inputs):
+            write_search(inputs["index"], terms, content_path, docs_path, basepath)
+
+        stages.append(Stage(
+            "search", search, inputs=["index", "render"], params={"basepath": basepath},
+            outputs=lambda result: [os.path.join(docs_path, SEARCH_DIR, "docs.json")],
+        ))
+        written.append("search")
+
+    if args.check_links:
+        def check(inputs):
+            # The index stage's result has no listings; the listings stage has
+            # the ones it wrote, so links to them are set lookups too.
+            index = dict(inputs["index"], listings=dict.fromkeys(inputs["listings"]["listings"]))
+            return check_links(index, links, content_path, docs_path, static_dir)
+
+        # After everything that writes to docs/, which it falls back to for
+        # links the index doesn't know.
+        stages.append(Stage("links", check, inputs=["index", "render", "listings"], after=written, paths=[static_dir]))
+
+    if args.compress:
+        def compress(inputs):
+            compress_outputs(docs_path, jobs=args.compress_jobs)
+
+        # Last, so it sees every page, listing and asset the build wrote.
+        producers = [stage.name for stage in stages if stage.name not in ("index", "links")]
+        stages.append(Stage(
+            "compress", compress, inputs=producers, params=sorted(available_encoders()),
+            outputs=lambda result: compressed_variants(docs_path),
+        ))
+    return stages
+
+
+def page_store(index, fresh, content_path, store_path, compute, what):
+    # Per-page data (search terms, links) for every page in the index. fresh
+    # only covers the pages rendered by this build; the others keep what
+    # earlier builds saved in store_path, as long as it was saved for the
+    # source as it is now. A page with nothing usable saved (e.g. one edited
+    # while the feature was off) is parsed once with compute(body); pages
+    # that fail to parse are left out. Returns relative path -> data.
+    old = load_manifest(store_path)
+    old_pages = old["pages"] if old is not None else {}
+    fresh = {Path(source).relative_to(content_path).as_posix(): data for source, data in fresh.items()}
+    store = new_manifest()
+    for relative_path in index["pages"]:
+        source = Path(content_path) / relative_path
+        try:
+            source_hash = hash_file(source)
+            if relative_path in fresh:
+                data = fresh[relative_path]
+            elif old_pages.get(relative_path, {}).get("source_hash") == source_hash:
+                data = old_pages[relative_path]["data"]
+            else:
+                with open(source) as f:
+                    _, body = split_front_matter(f.read())
+                data = compute(body)
+        except Exception as e:
+            logger.warning(f"Leaving {relative_path} out of the {what}: {e}")
+            continue
+        store["pages"][relative_path] = {"source_hash": source_hash, "data": data}
+    save_manifest(store, store_path)
+    return {relative_path: entry["data"] for relative_path, entry in store["pages"].items()}
+
+
+def write_search(index, terms, content_path, docs_path, basepath, terms_path=TERMS_PATH):
+    store = page_store(index, terms, content_path, terms_path, lambda body: page_terms(markdown_to_page(body).node), "search index")
+    resolve_url = basepath_resolver(basepath)
+    pages = [
+        (resolve_url(index["pages"][relative_path]["url"]), index["pages"][relative_path]["title"], source_terms)
+        for relative_path, source_terms in store.items()
+    ]
+    term_count, shards, size = write_search_index(pages, docs_path)
+    logger.info(f"Search index: {len(pages)} page(s), {term_count} terms in {shards} shard(s), {size / 1024:.1f} KB")
+
+
+def parse_links(body):
+    links = set()
+    markdown_to_page(body, link_recorder(lambda url: url, links))
+    return sorted(links)
+
+
+def check_links(index, links, content_path, docs_path, static_dir="./static", links_path=LINKS_PATH):
+    # Runs after everything else has been written. Returns the broken
+    # (page, url) pairs; build() reports them, also when the stage is
+    # skipped.
+    store = page_store(index, links, content_path, links_path, parse_links, "link check")
+    static_files = list_static_files(static_dir) if os.path.exists(static_dir) else {}
+    return find_broken_links(index, store, static_files, docs_path)
+
+
+def write_site_pages(index, old_index, template, docs_path, site_url="", index_path=INDEX_PATH):
+    written, unchanged, removed = write_listings(index, old_index, template, docs_path)
+    write_sitemap(index, docs_path, template.basepath, site_url)
+    save_site_index(index, index_path)
+    logger.info(f"Wrote {written} listing page(s), {unchanged} unchanged, removed {removed}")
 
 
+def report_build(stats, report_path):
+    report = stats.write_report(report_path)
+    stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in report["stages"].items())
+    logger.info(f"Built {report['pages']} page(s) in {report['wall_seconds']:.3f}s ({stages})")
+    hits = report["counters"].get("inline_cache_hits", 0)
+    misses = report["counters"].get("inline_cache_misses", 0)
+    if hits + misses:
+        logger.info(f"Inline cache: {hits} hit(s), {misses} miss(es), {hits / (hits + misses):.0%} hit rate")
+    for page in report["slowest_pages"][:5]:
+        logger.debug(f"  slow page: {page['source']} {page['seconds'] * 1000:.1f} ms")
+    logger.info(f"Build report written to {report_path}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+# Bump this when the output format changes in a way the source hashes below
+# can't see (e.g. the manifest layout itself).
+GENERATOR_VERSION = "1"
+MANIFEST_PATH = "./.build_cache/manifest.json"
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def generator_version():
+    # The generator's own source is part of its version, so editing any of
+    # the modules in src/ invalidates every page rendered by the old code.
+    digest = hashlib.sha256(GENERATOR_VERSION.encode())
+    src_dir = Path(__file__).resolve().parent
+    for module in sorted(src_dir.glob("*.py")):
+        if module.name.startswith("test_"):
+            continue
+        digest.update(module.name.encode())
+        digest.update(module.read_bytes())
+    return f"{GENERATOR_VERSION}-{digest.hexdigest()[:16]}"
+
+
+def new_manifest():
+    return {"version": generator_version(), "pages": {}}
+
+
+def load_manifest(path=MANIFEST_PATH, entries="pages", version=None):
+    # version defaults to the full generator version: rendered pages depend
+    # on the generator code, other manifests may only care about the format.
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not isinstance(manifest.get(entries), dict):
+        return None
+    if manifest.get("version") != (version or generator_version()):
+        return None
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def page_entry(source_hash, template_hash, basepath, output_path):
+    return {
+        "source_hash": source_hash,
+        "template_hash": template_hash,
+        "basepath": basepath,
+        "output": str(output_path),
+    }
+
+
+def is_page_current(old_entry, new_entry):
+    if old_entry != new_entry:
+        return False
+    return os.path.exists(new_entry["output"])
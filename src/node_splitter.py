@@ -1,7 +1,25 @@
+import os
 import re
 from textnode import TextNode, TextType
 
 
+# "scanner" is the single-pass tokenizer below, "legacy" the original chain of
+# split_nodes_* passes. Both produce the same nodes for any input the legacy
+# chain accepts; the switch is kept so output can be compared on real content.
+INLINE_PARSER = os.environ.get("SITE_GENERATOR_INLINE_PARSER", "scanner")
+
+# Images are found first and links only in the text between them, as in the
+# legacy chain: "[b](a![_)](ax)" is text and an image, not a link.
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+DELIMITER_PATTERN = re.compile(r"\*\*|_|`")
+DELIMITER_TYPES = {
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     result = []
     
@@ -128,7 +146,56 @@ def split_nodes_link(old_nodes):
     return resulting_list
 
 
+def scan_delimiters(text, start, end, result):
+    # Walks text[start:end] left to right, emitting TEXT runs and delimited
+    # spans. Each character is looked at once: DELIMITER_PATTERN finds the next
+    # opener and str.find jumps straight to its closer.
+    position = start
+    while True:
+        match = DELIMITER_PATTERN.search(text, position, end)
+        if match is None:
+            break
+        delimiter = match.group()
+        close = text.find(delimiter, match.end(), end)
+        if close == -1:
+            raise ValueError(f"No closing delimiter {delimiter} found")
+        if match.start() > position:
+            result.append(TextNode(text[position:match.start()], TextType.TEXT))
+        result.append(TextNode(text[match.end():close], DELIMITER_TYPES[delimiter]))
+        position = close + len(delimiter)
+    if position < end:
+        result.append(TextNode(text[position:end], TextType.TEXT))
+
+
+def scan_links(text, start, end, result):
+    # The character before start is either nothing or the ")" closing an
+    # image, so the lookbehind sees the same thing it would in the slice.
+    position = start
+    for match in LINK_PATTERN.finditer(text, start, end):
+        scan_delimiters(text, position, match.start(), result)
+        result.append(TextNode(match.group(1), TextType.LINK, match.group(2)))
+        position = match.end()
+    scan_delimiters(text, position, end, result)
+
+
+def scan_inline(text):
+    result = []
+    position = 0
+    for match in IMAGE_PATTERN.finditer(text):
+        scan_links(text, position, match.start(), result)
+        result.append(TextNode(match.group(1), TextType.IMAGE, match.group(2)))
+        position = match.end()
+    scan_links(text, position, len(text), result)
+    return result
+
+
 def text_to_textnodes(text):
+    if INLINE_PARSER == "legacy":
+        return text_to_textnodes_legacy(text)
+    return scan_inline(text)
+
+
+def text_to_textnodes_legacy(text):
     nodes = [TextNode(text, TextType.TEXT)]
     nodes = split_nodes_image(nodes)
     nodes = split_nodes_link(nodes)
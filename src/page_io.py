@@ -0,0 +1,138 @@
+import contextlib
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+DEFAULT_IO_JOBS = 8
+# Upper bound on source text read ahead of the renderer, and separately on
+# page text waiting to be written.
+DEFAULT_IO_BUFFER = 64
+# Every suffix compress.available_encoders can write.
+COMPRESSED_SUFFIXES = (".gz", ".br", ".zst")
+
+
+def remove_compressed(path):
+    # Drops the compressed copies of a file that is about to change, so a
+    # server never prefers a variant of its old content. A build with
+    # --compress writes them again.
+    for suffix in COMPRESSED_SUFFIXES:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(f"{path}{suffix}")
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode="w"):
+    # Writes next to path and renames over it when the block finishes, so
+    # readers (and a build that crashed halfway) only ever see the old file
+    # or the complete new one. On an error the partial file is removed.
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    remove_compressed(path)
+    os.replace(tmp_path, path)
+
+
+def write_text(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_open(path) as f:
+        f.write(text)
+
+
+def prefetch(paths, read, jobs=DEFAULT_IO_JOBS, max_bytes=DEFAULT_IO_BUFFER * 1024 * 1024):
+    # Yields one future per path, in order, whose result is read(path).
+    # Up to jobs reads run ahead of the consumer on a thread pool, and no
+    # new read starts while the finished ones it hasn't taken yet hold
+    # max_bytes or more. read may return None (e.g. for a file that will be
+    # streamed instead), which counts as nothing.
+    lock = threading.Lock()
+    buffered = 0
+    running = 0
+
+    def run(path):
+        nonlocal buffered, running
+        try:
+            data = read(path)
+        finally:
+            with lock:
+                running -= 1
+        with lock:
+            buffered += len(data or "")
+        return data
+
+    paths = iter(paths)
+    window = deque()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            # The next read always starts when nothing is queued, however
+            # small max_bytes is.
+            while not window or (running < jobs and buffered < max_bytes):
+                path = next(paths, None)
+                if path is None:
+                    break
+                with lock:
+                    running += 1
+                window.append(executor.submit(run, path))
+            if not window:
+                return
+            future = window.popleft()
+            yield future
+            if future.exception() is None:
+                with lock:
+                    buffered -= len(future.result() or "")
+
+
+class PageWriter:
+    # Writes files on a thread pool so rendering the next page overlaps
+    # with writing the last one. write() only blocks while max_bytes of
+    # text is already waiting to be written. Every file is written with
+    # atomic_open. Errors don't stop the other writes; close() returns them
+    # as (key, error) pairs.
+    def __init__(self, jobs=DEFAULT_IO_JOBS, max_bytes=DEFAULT_IO_BUFFER * 1024 * 1024):
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.max_bytes = max_bytes
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.failures = []
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+    def write(self, path, text, key=None):
+        size = len(text)
+        with self.condition:
+            # A page bigger than max_bytes still goes through, alone.
+            while self.in_flight and self.in_flight + size > self.max_bytes:
+                self.condition.wait()
+            self.in_flight += size
+        self.executor.submit(self.write_file, path, text, size, path if key is None else key)
+
+
+    def write_file(self, path, text, size, key):
+        try:
+            write_text(path, text)
+        except Exception as e:
+            with self.condition:
+                self.failures.append((key, f"{type(e).__name__}: {e}"))
+        finally:
+            with self.condition:
+                self.in_flight -= size
+                self.condition.notify_all()
+
+
+    def close(self):
+        # Waits for every queued write.
+        self.executor.shutdown(wait=True)
+        return self.failures
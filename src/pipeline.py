@@ -0,0 +1,198 @@
+import json
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from instrument import logger
+from manifest import generator_version, hash_bytes, load_manifest, save_manifest
+
+
+PIPELINE_STATE_PATH = "./.build_cache/pipeline.json"
+
+
+class DeferredFailure(Exception):
+    # Raised by a stage that still produced a usable result (e.g. the pages
+    # that did render) but failed in part. Stages that depend on it run as
+    # usual; the stage itself isn't recorded, so the next build runs it
+    # again, and error is raised once the whole pipeline has finished.
+    def __init__(self, result, error):
+        super().__init__(str(error))
+        self.result = result
+        self.error = error
+
+
+class Stage:
+    # One step of the build.
+    #   run(results)  does the work; results maps the names in inputs to
+    #                 their results. Its own result must be JSON-serializable.
+    #   inputs        stages whose results it reads
+    #   after         stages it has to wait for without reading their
+    #                 results (e.g. compression after everything that
+    #                 writes to docs/)
+    #   paths         files and directories it reads
+    #   params        settings that change its output (flags, basepath, ...)
+    #   outputs       outputs(result) -> paths the stage wrote; it runs
+    #                 again when one of them is gone
+    #   timed         add its run time to the build stats under its name
+    def __init__(self, name, run, inputs=(), after=(), paths=(), params=None, outputs=None, timed=True):
+        self.name = name
+        self.run = run
+        self.inputs = tuple(inputs)
+        self.after = tuple(after)
+        self.paths = tuple(paths)
+        self.params = params
+        self.outputs = outputs
+        self.timed = timed
+
+
+    def __repr__(self):
+        return f"Stage({self.name}, inputs={self.inputs}, after={self.after}, paths={self.paths})"
+
+
+def path_signature(path):
+    # Size and mtime of path, or of every file under it for a directory.
+    # Nothing is read, so checking a stage is much cheaper than running it.
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            full_path = os.path.join(root, name)
+            stat = os.stat(full_path)
+            files.append([os.path.relpath(full_path, path), stat.st_size, stat.st_mtime_ns])
+    return files
+
+
+def result_hash(result):
+    return hash_bytes(json.dumps(result, sort_keys=True).encode())
+
+
+class Pipeline:
+    # Runs stages as a dependency graph: every stage starts as soon as the
+    # stages it depends on are done, so independent ones (e.g. the static
+    # copy, image processing and page rendering) overlap. With reuse, a
+    # stage whose inputs (its paths, params and the results of its input
+    # stages) match the last recorded run, and whose outputs still exist,
+    # is skipped and its recorded result is used instead.
+    def __init__(self, stages, state_path=PIPELINE_STATE_PATH):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_path = state_path
+        for stage in stages:
+            for dependency in stage.inputs + stage.after:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage {stage.name} depends on unknown stage {dependency}")
+        self.order()
+
+
+    def order(self):
+        # Topological order; raises on cycles.
+        ordered = []
+        visiting = set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through {name}")
+            visiting.add(name)
+            stage = self.stages[name]
+            for dependency in stage.inputs + stage.after:
+                visit(dependency)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return ordered
+
+
+    def signature(self, stage, results, runs):
+        # An input stage counts with the id of the run that produced its
+        # result, so every time it actually runs (because its inputs
+        # changed, or because its outputs were gone) the stages after it
+        # run too, even when its result came out the same.
+        return result_hash({
+            "params": stage.params,
+            "paths": {path: path_signature(path) for path in stage.paths},
+            "inputs": {name: [runs[name], result_hash(results[name])] for name in stage.inputs},
+        })
+
+
+    def is_current(self, stage, entry, signature):
+        if entry is None or entry["signature"] != signature:
+            return False
+        if stage.outputs is None:
+            return True
+        return all(os.path.exists(path) for path in stage.outputs(entry["result"]))
+
+
+    def run(self, stats=None, reuse=True):
+        # Returns (results, skipped stage names). A stage raising anything
+        # but DeferredFailure stops the build once the running stages are
+        # done; the stages that finished are still recorded.
+        previous = load_manifest(self.state_path, "stages")
+        recorded = previous["stages"] if previous is not None else {}
+        recorded = {name: entry for name, entry in recorded.items() if name in self.stages}
+        reusable = dict(recorded) if reuse else {}
+        results = {}
+        runs = {}
+        skipped = []
+        deferred = []
+        pending = self.order()
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=max(len(self.stages), 1)) as executor:
+            while True:
+                progressed = False
+                for name in list(pending) if error is None else []:
+                    stage = self.stages[name]
+                    if not all(dependency in results for dependency in stage.inputs + stage.after):
+                        continue
+                    pending.remove(name)
+                    signature = self.signature(stage, results, runs)
+                    entry = reusable.get(name)
+                    if self.is_current(stage, entry, signature):
+                        logger.info(f"Stage {name}: inputs unchanged, skipped")
+                        results[name] = entry["result"]
+                        runs[name] = entry["run"]
+                        skipped.append(name)
+                        progressed = True
+                        continue
+                    stage_inputs = {dependency: results[dependency] for dependency in stage.inputs}
+                    running[executor.submit(self.run_stage, stage, stage_inputs, stats)] = (name, signature)
+                if progressed:
+                    continue
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name, signature = running.pop(future)
+                    recorded.pop(name, None)
+                    runs[name] = uuid.uuid4().hex
+                    try:
+                        results[name] = future.result()
+                        recorded[name] = {"signature": signature, "result": results[name], "run": runs[name]}
+                    except DeferredFailure as e:
+                        results[name] = e.result
+                        deferred.append(e.error)
+                    except Exception as e:
+                        if error is None:
+                            error = e
+        save_manifest({"version": generator_version(), "stages": recorded}, self.state_path)
+        if error is not None:
+            raise error
+        if deferred:
+            raise deferred[0]
+        return results, skipped
+
+
+    def run_stage(self, stage, inputs, stats):
+        start = time.perf_counter()
+        try:
+            return stage.run(inputs)
+        finally:
+            if stats is not None and stage.timed:
+                stats.add(stage.name, time.perf_counter() - start)
+            logger.debug(f"Stage {stage.name} took {time.perf_counter() - start:.3f}s")
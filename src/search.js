@@ -0,0 +1,100 @@
+// Loader for the search index search.py writes next to this file. Include
+// it with <script src=".../search/search.js"></script> and call
+// siteSearch("query"), which resolves to [{url, title, score}], best first.
+// docs.json is fetched on the first search and each shard the first time a
+// query word starts with its character.
+(function () {
+  "use strict";
+
+  var base = document.currentScript.src.replace(/[^/]*$/, "");
+  var documents = null;
+  var shards = {};
+
+  function fetchJSON(name) {
+    return fetch(base + name).then(function (response) {
+      if (!response.ok) {
+        throw new Error("search: could not load " + name);
+      }
+      return response.json();
+    });
+  }
+
+  function decodeShard(entries) {
+    // Inverse of search.encode_shard: front-coded terms, gap-coded ids.
+    var postings = {};
+    var previous = "";
+    entries.forEach(function (entry) {
+      var term = previous.slice(0, entry[0]) + entry[1];
+      var id = 0;
+      postings[term] = entry[2].map(function (gap) {
+        id += gap;
+        return id;
+      });
+      previous = term;
+    });
+    return postings;
+  }
+
+  function shardKey(word) {
+    var first = word.charAt(0);
+    return /[a-z0-9]/.test(first) ? first : "_";
+  }
+
+  function loadShard(key) {
+    if (!shards[key]) {
+      shards[key] = fetchJSON(key + ".json").then(decodeShard);
+    }
+    return shards[key];
+  }
+
+  function tokenize(text) {
+    var words = text.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || [];
+    return words.filter(function (word) {
+      return word.length >= 2;
+    });
+  }
+
+  function matches(word, available) {
+    // Ids of the documents containing a term that starts with word, so
+    // results show up while the last word is still being typed.
+    var key = shardKey(word);
+    if (available.indexOf(key) === -1) {
+      return Promise.resolve([]);
+    }
+    return loadShard(key).then(function (postings) {
+      var ids = {};
+      Object.keys(postings).forEach(function (term) {
+        if (term.lastIndexOf(word, 0) === 0) {
+          postings[term].forEach(function (id) {
+            ids[id] = true;
+          });
+        }
+      });
+      return Object.keys(ids);
+    });
+  }
+
+  window.siteSearch = function (query) {
+    var words = tokenize(query);
+    if (!documents) {
+      documents = fetchJSON("docs.json");
+    }
+    return documents.then(function (index) {
+      return Promise.all(words.map(function (word) {
+        return matches(word, index.shards);
+      })).then(function (results) {
+        var scores = {};
+        results.forEach(function (ids) {
+          ids.forEach(function (id) {
+            scores[id] = (scores[id] || 0) + 1;
+          });
+        });
+        return Object.keys(scores).sort(function (a, b) {
+          return scores[b] - scores[a] || a - b;
+        }).map(function (id) {
+          return {url: index.docs[id][0], title: index.docs[id][1], score: scores[id]};
+        });
+      });
+    });
+  };
+})();
@@ -0,0 +1,117 @@
+import json
+import os
+import re
+from pathlib import Path
+from htmlnode import ParentNode
+from page_io import atomic_open
+
+
+SEARCH_DIR = "search"
+TERMS_PATH = "./.build_cache/search_terms.json"
+LOADER_PATH = Path(__file__).resolve().parent / "search.js"
+WORD_PATTERN = re.compile(r"\w+")
+MIN_WORD_LENGTH = 2
+
+
+def tokenize(text):
+    return [word for word in WORD_PATTERN.findall(text.lower()) if len(word) >= MIN_WORD_LENGTH]
+
+
+def add_node_terms(node, terms):
+    # Adds the words of every leaf in the tree to the terms set. The leaves
+    # are the TextNodes text_to_textnodes produced (plus code blocks), so
+    # this reads the parse results instead of re-parsing HTML; image alt
+    # text is included.
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ParentNode):
+            stack.extend(node.children)
+            continue
+        if node.value:
+            terms.update(tokenize(node.value))
+        if node.props and "alt" in node.props:
+            terms.update(tokenize(node.props["alt"]))
+    return terms
+
+
+def page_terms(node):
+    return sorted(add_node_terms(node, set()))
+
+
+def shard_key(term):
+    first = term[0]
+    return first if "a" <= first <= "z" or "0" <= first <= "9" else "_"
+
+
+def encode_shard(postings):
+    # postings maps term -> ascending document ids. Terms are stored sorted
+    # and front coded (length of the prefix shared with the previous term,
+    # then the rest), and each posting list as gaps between ids.
+    entries = []
+    previous = ""
+    for term in sorted(postings):
+        shared = len(os.path.commonprefix([previous, term]))
+        ids = postings[term]
+        gaps = [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+        entries.append([shared, term[shared:], gaps])
+        previous = term
+    return entries
+
+
+def decode_shard(entries):
+    postings = {}
+    previous = ""
+    for shared, suffix, gaps in entries:
+        term = previous[:shared] + suffix
+        ids = []
+        total = 0
+        for gap in gaps:
+            total += gap
+            ids.append(total)
+        postings[term] = ids
+        previous = term
+    return postings
+
+
+def build_search_index(pages):
+    # pages is a list of (url, title, terms). Returns the documents file
+    # and the shards, keyed by the first character of their terms.
+    documents = []
+    shards = {}
+    for doc_id, (url, title, terms) in enumerate(sorted(pages)):
+        documents.append([url, title])
+        for term in terms:
+            shards.setdefault(shard_key(term), {}).setdefault(term, []).append(doc_id)
+    encoded = {key: encode_shard(postings) for key, postings in shards.items()}
+    return {"docs": documents, "shards": sorted(encoded)}, encoded
+
+
+def write_if_changed(path, data):
+    # Returns the size of data; unchanged files keep their mtime.
+    try:
+        with open(path) as f:
+            if f.read() == data:
+                return len(data)
+    except OSError:
+        pass
+    with atomic_open(path) as f:
+        f.write(data)
+    return len(data)
+
+
+def write_search_index(pages, docs_path):
+    # Writes docs/search/: docs.json (document list and shard names), one
+    # <key>.json per shard and the search.js loader. Returns the number of
+    # terms and shards and the total size in bytes.
+    directory = Path(docs_path) / SEARCH_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    documents, shards = build_search_index(pages)
+    size = write_if_changed(directory / "docs.json", json.dumps(documents, separators=(",", ":")))
+    for key, entries in shards.items():
+        size += write_if_changed(directory / f"{key}.json", json.dumps(entries, separators=(",", ":")))
+    for path in directory.glob("*.json"):
+        if path.stem != "docs" and path.stem not in shards:
+            path.unlink()
+    size += write_if_changed(directory / LOADER_PATH.name, LOADER_PATH.read_text())
+    return sum(len(entries) for entries in shards.values()), len(shards), size
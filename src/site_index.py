@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from xml.sax.saxutils import escape
+from block_splitter import iter_blocks, scan_page
+from htmlnode import LeafNode, ParentNode
+from instrument import logger
+from manifest import generator_version, hash_bytes, load_manifest, save_manifest
+from page_io import atomic_open
+from template import basepath_resolver, split_front_matter_lines, text_values
+
+
+INDEX_PATH = "./.build_cache/site_index.json"
+SITEMAP_NAME = "sitemap.xml"
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def page_url(relative_path):
+    # "blog/tom/index.md" -> "/blog/tom/", "about.md" -> "/about.html".
+    path = Path(relative_path).with_suffix(".html")
+    if path.name == "index.html":
+        parent = path.parent.as_posix()
+        return "/" if parent == "." else f"/{parent}/"
+    return "/" + path.as_posix()
+
+
+def output_name(relative_path):
+    return Path(relative_path).with_suffix(".html").as_posix()
+
+
+def tag_slug(tag):
+    return "-".join(tag.lower().split())
+
+
+def index_entry(relative_path, source, stat):
+    # Reads the front matter and only as many blocks as it takes to find the
+    # title and first paragraph.
+    with open(source) as f:
+        metadata, lines = split_front_matter_lines(f)
+        result = scan_page(iter_blocks(lines))
+    return {
+        "url": page_url(relative_path),
+        "title": result.title or relative_path,
+        "description": metadata.get("description", result.description or ""),
+        "date": metadata.get("date", ""),
+        "tags": [tag.strip() for tag in metadata.get("tags", "").split(",") if tag.strip()],
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def load_site_index(path=INDEX_PATH):
+    return load_manifest(path)
+
+
+def save_site_index(index, path=INDEX_PATH):
+    save_manifest(index, path)
+
+
+def build_site_index(content_path, old_index=None):
+    # Metadata pass over every markdown page. Pages whose size and mtime
+    # match the old index keep their entry without being opened. Returns the
+    # new index and the number of pages that had to be read.
+    old_pages = old_index["pages"] if old_index is not None else {}
+    index = {"version": generator_version(), "pages": {}, "listings": {}}
+    read = 0
+    content_path = Path(content_path)
+    for source in sorted(content_path.rglob("*.md")):
+        relative_path = source.relative_to(content_path).as_posix()
+        stat = source.stat()
+        entry = old_pages.get(relative_path)
+        if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            try:
+                entry = index_entry(relative_path, source, stat)
+            except (OSError, ValueError) as e:
+                # The render pass reports the page; it just isn't listed.
+                logger.warning(f"Leaving {source} out of the site index: {e}")
+                continue
+            read += 1
+        index["pages"][relative_path] = entry
+    return index, read
+
+
+def listing_item(entry):
+    return {"url": entry["url"], "title": entry["title"], "date": entry["date"]}
+
+
+def newest_first(entries):
+    entries = sorted(entries, key=lambda entry: entry["url"])
+    return [listing_item(entry) for entry in sorted(entries, key=lambda entry: entry["date"], reverse=True)]
+
+
+def listing_pages(index):
+    # Output path (relative to docs/) -> (title, groups) for every listing
+    # the index calls for, where groups is a list of (heading, items):
+    #   <section>/index.html  top-level content directories without an index.md
+    #   tags/index.html, tags/<tag>/index.html  from "tags: a, b" front matter
+    #   archive/index.html    every dated page, grouped by year
+    # A content page with the same output path always wins over a listing.
+    pages = index["pages"]
+    sections = defaultdict(list)
+    tags = defaultdict(list)
+    for relative_path, entry in pages.items():
+        if "/" in relative_path:
+            sections[relative_path.split("/", 1)[0]].append(entry)
+        for tag in entry["tags"]:
+            tags[tag].append(entry)
+
+    listings = {}
+    for section, entries in sections.items():
+        listings[f"{section}/index.html"] = (section.replace("-", " ").capitalize(), [(None, newest_first(entries))])
+    if tags:
+        tag_items = [{"url": f"/tags/{tag_slug(tag)}/", "title": tag, "date": ""} for tag in sorted(tags)]
+        listings["tags/index.html"] = ("Tags", [(None, tag_items)])
+        for tag, entries in tags.items():
+            listings[f"tags/{tag_slug(tag)}/index.html"] = (f"Tagged {tag}", [(None, newest_first(entries))])
+    years = defaultdict(list)
+    for entry in pages.values():
+        if entry["date"]:
+            years[entry["date"][:4]].append(entry)
+    if years:
+        groups = [(year, newest_first(years[year])) for year in sorted(years, reverse=True)]
+        listings["archive/index.html"] = ("Archive", groups)
+
+    page_outputs = {output_name(relative_path) for relative_path in pages}
+    return {output: listing for output, listing in listings.items() if output not in page_outputs}
+
+
+def listing_node(title, groups, resolve_url):
+    children = [ParentNode("h1", [LeafNode(None, title)])]
+    for heading, items in groups:
+        if heading:
+            children.append(ParentNode("h2", [LeafNode(None, heading)]))
+        list_items = []
+        for item in items:
+            item_children = [LeafNode("a", item["title"], {"href": resolve_url(item["url"])})]
+            if item["date"]:
+                item_children.append(LeafNode(None, " "))
+                item_children.append(LeafNode("time", item["date"]))
+            list_items.append(ParentNode("li", item_children))
+        children.append(ParentNode("ul", list_items))
+    return ParentNode("div", children)
+
+
+def write_listings(index, old_index, template, docs_path):
+    # Renders the listing pages through the page template. A listing is only
+    # rewritten when its items, the template or the basepath changed (or its
+    # output is missing); listings that no longer exist are deleted. Their
+    # signatures are recorded in index["listings"]. Returns
+    # (written, unchanged, removed).
+    old_listings = old_index.get("listings", {}) if old_index is not None else {}
+    resolve_url = basepath_resolver(template.basepath, template.assets)
+    written = unchanged = removed = 0
+    for output, (title, groups) in sorted(listing_pages(index).items()):
+        signature = hash_bytes(json.dumps([template.basepath, template.literals, title, groups]).encode())
+        index["listings"][output] = signature
+        output_path = Path(docs_path) / output
+        if old_listings.get(output) == signature and output_path.exists():
+            unchanged += 1
+            continue
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        values = text_values({}, title)
+        values["content"] = listing_node(title, groups, resolve_url)
+        with atomic_open(output_path) as f:
+            template.render_to(f, values)
+        written += 1
+
+    page_outputs = {output_name(relative_path) for relative_path in index["pages"]}
+    for output in old_listings:
+        if output in index["listings"] or output in page_outputs:
+            continue
+        output_path = Path(docs_path) / output
+        if output_path.exists():
+            output_path.unlink()
+            removed += 1
+    return written, unchanged, removed
+
+
+def lastmod(entry):
+    if DATE_PATTERN.fullmatch(entry["date"]):
+        return entry["date"]
+    return time.strftime("%Y-%m-%d", time.gmtime(entry["mtime_ns"] / 1e9))
+
+
+def sitemap_xml(index, basepath, site_url=""):
+    # site_url ("https://example.com") makes the <loc>s absolute, as search
+    # engines expect; without it they are site-absolute paths.
+    prefix = site_url.rstrip("/") + basepath[:-1]
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    entries = [(entry["url"], lastmod(entry)) for entry in index["pages"].values()]
+    entries += [(page_url(output), None) for output in index["listings"]]
+    for url, modified in sorted(entries):
+        lines.append(f"  <url><loc>{escape(prefix + url)}</loc>" + (f"<lastmod>{modified}</lastmod>" if modified else "") + "</url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def write_sitemap(index, docs_path, basepath, site_url=""):
+    # Leaves the file (and its mtime) alone when nothing changed.
+    path = os.path.join(docs_path, SITEMAP_NAME)
+    sitemap = sitemap_xml(index, basepath, site_url)
+    try:
+        with open(path) as f:
+            if f.read() == sitemap:
+                return False
+    except OSError:
+        pass
+    with atomic_open(path) as f:
+        f.write(sitemap)
+    return True
@@ -0,0 +1,143 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from instrument import logger
+from manifest import GENERATOR_VERSION, hash_file, load_manifest, save_manifest
+from page_io import remove_compressed
+
+
+STATIC_MANIFEST_PATH = "./.build_cache/static_manifest.json"
+DEFAULT_SYNC_JOBS = 8
+
+
+def list_static_files(source_dir):
+    # Relative posix path -> os.stat_result for every file under source_dir.
+    files = {}
+    for root, dirs, names in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, source_dir).replace(os.sep, "/")
+            files[relative] = os.stat(path)
+    return files
+
+
+def is_file_current(source_path, source_stat, dest_path, checksum=False):
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if dest_stat.st_size != source_stat.st_size:
+        return False
+    if checksum:
+        return hash_file(source_path) == hash_file(dest_path)
+    return dest_stat.st_mtime_ns == source_stat.st_mtime_ns
+
+
+def copy_file_fast(source_path, dest_path):
+    # copy_file_range lets the kernel copy (or reflink, on filesystems that
+    # support it) without the data passing through Python. It only works
+    # within one filesystem; anything else falls back to shutil.
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(source_path, "rb") as src, open(dest_path, "wb") as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            pass
+    shutil.copyfile(source_path, dest_path)
+
+
+def sync_file(source_path, source_stat, dest_path, hardlink=False):
+    # Writes next to the destination and renames over it, so a reader never
+    # sees a half-copied file. The source mtime is kept so the next sync
+    # can compare size and mtime.
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    remove_compressed(dest_path)
+    tmp_path = dest_path + ".tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if hardlink:
+        try:
+            os.link(source_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+            return
+        except OSError:
+            pass
+    copy_file_fast(source_path, tmp_path)
+    os.utime(tmp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    os.replace(tmp_path, dest_path)
+
+
+def load_static_manifest(path, dest_dir):
+    manifest = load_manifest(path, "files", GENERATOR_VERSION)
+    if manifest is None or manifest.get("dest") != os.path.abspath(dest_dir):
+        return {}
+    return manifest["files"]
+
+
+def remove_stale(dest_dir, relative_paths):
+    removed = 0
+    for relative in relative_paths:
+        dest_path = os.path.join(dest_dir, relative)
+        if not os.path.exists(dest_path):
+            continue
+        os.remove(dest_path)
+        removed += 1
+        # Drop directories the removal left empty, but never dest_dir itself.
+        parent = os.path.dirname(dest_path)
+        while os.path.abspath(parent) != os.path.abspath(dest_dir) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+    return removed
+
+
+def sync_static(source_dir, dest_dir, manifest_path=STATIC_MANIFEST_PATH, checksum=False, hardlink=False, jobs=DEFAULT_SYNC_JOBS, names=None):
+    # Copies only new or changed files from source_dir to dest_dir and
+    # removes files that an earlier sync copied but are gone from source_dir.
+    # Other files in dest_dir (the rendered pages) are never touched. names
+    # optionally maps a source path to the path it is written under (e.g.
+    # a fingerprinted one); files it leaves out keep their own path.
+    source_files = list_static_files(source_dir)
+    previous = load_static_manifest(manifest_path, dest_dir)
+    if names is None:
+        names = {}
+    outputs = {names.get(relative, relative): source_stat for relative, source_stat in source_files.items()}
+
+    to_copy = []
+    for relative, source_stat in source_files.items():
+        source_path = os.path.join(source_dir, relative)
+        dest_path = os.path.join(dest_dir, names.get(relative, relative))
+        if not is_file_current(source_path, source_stat, dest_path, checksum):
+            to_copy.append((source_path, source_stat, dest_path))
+
+    def copy_one(item):
+        source_path, source_stat, dest_path = item
+        sync_file(source_path, source_stat, dest_path, hardlink)
+        logger.debug(f"Copied file: {source_path} -> {dest_path}")
+
+    if jobs > 1 and len(to_copy) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(copy_one, to_copy))
+    else:
+        for item in to_copy:
+            copy_one(item)
+
+    removed = remove_stale(dest_dir, [output for output in previous if output not in outputs])
+    save_manifest(
+        {
+            "version": GENERATOR_VERSION,
+            "dest": os.path.abspath(dest_dir),
+            "files": {output: source_stat.st_size for output, source_stat in outputs.items()},
+        },
+        manifest_path,
+    )
+    skipped = len(source_files) - len(to_copy)
+    logger.info(f"Static files: copied {len(to_copy)}, {skipped} unchanged, removed {removed}")
+    return len(to_copy), skipped, removed
@@ -0,0 +1,192 @@
+import html
+import itertools
+import json
+import re
+import time
+from instrument import add_timing
+from manifest import hash_bytes
+
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+PRESERVE_PATTERN = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.DOTALL | re.IGNORECASE)
+# Whitespace between two tags, with the names of both.
+TAG_GAP_PATTERN = re.compile(r"(<(/?)([!\w-]+)[^>]*>)\s+(?=<(/?)([!\w-]+))")
+WHITESPACE_RUN_PATTERN = re.compile(r"\s+")
+STASHED_PATTERN = re.compile(r"<\w+ \x00(\d+)\x00>")
+URL_ATTRIBUTE_PATTERN = re.compile(r'\b(href|src)="(/[^"]*)"')
+# Whitespace next to these tags never renders, so minify_html drops it;
+# between other (inline) tags it is collapsed to one space.
+BLOCK_TAGS = {
+    "!doctype", "html", "head", "body", "title", "meta", "link", "base", "script", "style", "noscript",
+    "address", "article", "aside", "blockquote", "details", "div", "dl", "dt", "dd", "fieldset", "figcaption",
+    "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol",
+    "p", "pre", "section", "table", "thead", "tbody", "tfoot", "tr", "td", "th", "ul",
+}
+
+
+def basepath_resolver(basepath, assets=None):
+    # Site-absolute URLs ("/blog/tom") get the basepath in front of them,
+    # everything else (external links, relative paths, anchors) is left alone.
+    # assets maps static paths to their fingerprinted names ("index.css" ->
+    # "index.3f2a9b1c0d.css"); a reference to one is rewritten with a single
+    # dictionary lookup.
+    if assets is None:
+        assets = {}
+
+    def resolve_url(url):
+        if url and url.startswith("/") and not url.startswith("//"):
+            path = url[1:]
+            return basepath + assets.get(path, path)
+        return url
+    return resolve_url
+
+
+def minify_html(source):
+    # Used on template source at compile time: drops the indentation and
+    # line breaks next to block-level tags and collapses other whitespace
+    # runs to one space. <pre>, <textarea>, <script> and <style> elements
+    # are swapped for placeholder tags meanwhile, so they come back as-is.
+    preserved = []
+
+    def stash(match):
+        preserved.append(match.group(1))
+        return f"<{match.group(2)} \x00{len(preserved) - 1}\x00>"
+
+    source = PRESERVE_PATTERN.sub(stash, source)
+    source = TAG_GAP_PATTERN.sub(join_tags, source)
+    source = WHITESPACE_RUN_PATTERN.sub(" ", source)
+    return STASHED_PATTERN.sub(lambda match: preserved[int(match.group(1))], source)
+
+
+def join_tags(match):
+    if match.group(3).lower() in BLOCK_TAGS or match.group(5).lower() in BLOCK_TAGS:
+        return match.group(1)
+    return match.group(1) + " "
+
+
+def split_front_matter(markdown):
+    # Optional "key: value" block fenced by --- lines at the very top of a page.
+    if not markdown.startswith("---\n"):
+        return {}, markdown
+    end = markdown.find("\n---", 3)
+    if end == -1:
+        raise ValueError("Front matter is missing its closing ---")
+    after = markdown.find("\n", end + 4)
+    body = "" if after == -1 else markdown[after + 1:]
+    return parse_front_matter(markdown[4:end].split("\n")), body
+
+
+def split_front_matter_lines(lines):
+    # Same as split_front_matter for an iterable of lines (e.g. an open
+    # file): returns the metadata and an iterator over the body lines, having
+    # read no further than the closing ---.
+    lines = iter(lines)
+    first = next(lines, "")
+    if first.rstrip("\r\n") != "---" or first == "---":
+        return {}, itertools.chain([first], lines)
+    front_matter = []
+    for line in lines:
+        if line.startswith("---"):
+            return parse_front_matter(front_matter), lines
+        front_matter.append(line.rstrip("\r\n"))
+    raise ValueError("Front matter is missing its closing ---")
+
+
+def parse_front_matter(lines):
+    metadata = {}
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        key, separator, value = line.partition(":")
+        if not separator:
+            raise ValueError(f"Invalid front matter line: {line}")
+        metadata[key.strip().lower()] = value.strip().strip("\"'")
+    return metadata
+
+
+def text_values(metadata, title, description=""):
+    # Template values for a page's front matter, title and description.
+    # They are plain text, and a template may put them in an attribute
+    # (content="{{ Description }}"), so they are escaped here; "content"
+    # is added by the caller and is HTML already.
+    values = {key: html.escape(value) for key, value in metadata.items()}
+    values["title"] = html.escape(title)
+    values.setdefault("description", html.escape(description or ""))
+    return values
+
+
+class Template:
+    def __init__(self, source, basepath="/", minify=False, assets=None, images=None):
+        # With minify, the literals are minified here and node values are
+        # serialized minified, so the page never exists unminified. assets
+        # is the fingerprinted asset map; the template's own href/src
+        # references are rewritten through it once, here. images is the
+        # image map pages get <img> dimensions and srcsets from.
+        self.basepath = basepath
+        self.minify = minify
+        self.assets = assets or {}
+        self.images = images or {}
+        # Rendered bodies depend on the image map, so it is hashed once for
+        # the cache keys rather than per page.
+        self.images_hash = hash_bytes(json.dumps(self.images, sort_keys=True).encode()) if self.images else ""
+        resolve_url = basepath_resolver(basepath, self.assets)
+        source = URL_ATTRIBUTE_PATTERN.sub(lambda match: f'{match.group(1)}="{resolve_url(match.group(2))}"', source)
+        if minify:
+            source = minify_html(source)
+        # literals always has one more entry than slots: render interleaves
+        # literals[0], slots[0], literals[1], ... literals[-1].
+        self.literals = []
+        self.slots = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            self.literals.append(source[position:match.start()])
+            self.slots.append(match.group(1).lower())
+            position = match.end()
+        self.literals.append(source[position:])
+
+
+    def render(self, values):
+        # values maps lower-case placeholder names to strings or HTMLNodes;
+        # placeholders without a value render as an empty string.
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot, "")
+            parts.append(value if isinstance(value, str) else value.to_html(self.minify))
+            parts.append(literal)
+        return "".join(parts)
+
+
+    def render_to(self, out, values, timings=None):
+        # Same as render, but node values are streamed straight into out.
+        # With timings, streaming the nodes counts as "serialize" and
+        # everything else as "template". A streamed document records its
+        # own parsing stages while it writes; those count as themselves.
+        start = time.perf_counter()
+        before = sum(timings.values()) if timings is not None else 0.0
+        serialize = 0.0
+        write = out.write
+        write(self.literals[0])
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot, "")
+            if isinstance(value, str):
+                write(value)
+            elif timings is None:
+                value.write_html(out, self.minify)
+            else:
+                node_start = time.perf_counter()
+                nested = sum(timings.values())
+                value.write_html(out, self.minify)
+                serialize += time.perf_counter() - node_start - (sum(timings.values()) - nested)
+            write(literal)
+        if timings is not None:
+            timings["serialize"] = timings.get("serialize", 0.0) + serialize
+            add_timing(timings, "template", start + sum(timings.values()) - before)
+
+
+    def __repr__(self):
+        return f"Template({self.slots}, {self.basepath}, minify={self.minify})"
+
+
+def load_template(template_path, basepath="/", minify=False, assets=None, images=None):
+    with open(template_path) as tpath:
+        return Template(tpath.read(), basepath, minify, assets, images)
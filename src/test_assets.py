@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+from assets import *
+from manifest import hash_bytes
+from template import Template
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        self.docs = self.root / "docs"
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "tom.png").write_bytes(b"\x89PNG tom")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self):
+        return sync_assets(
+            self.static,
+            self.docs,
+            str(self.root / "cache" / "static.json"),
+            str(self.root / "cache" / "assets.json"),
+        )
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(fingerprinted_name("images/tom.png", "3f2a9b1c0d" + "0" * 54), "images/tom.3f2a9b1c0d.png")
+        self.assertEqual(fingerprinted_name("CNAME", "abcdef0123456789"), "CNAME.abcdef0123")
+        self.assertEqual(fingerprinted_name(".nojekyll", "abcdef0123456789"), ".nojekyll.abcdef0123")
+
+    def test_files_are_written_under_fingerprinted_names(self):
+        assets = self.sync()
+        css = f"index.{hash_bytes(b'body {}')[:FINGERPRINT_LENGTH]}.css"
+        self.assertEqual(assets["index.css"], css)
+        self.assertEqual((self.docs / css).read_text(), "body {}")
+        self.assertTrue((self.docs / assets["images/tom.png"]).exists())
+        self.assertFalse((self.docs / "index.css").exists())
+
+    def test_changed_file_replaces_old_version(self):
+        old = self.sync()
+        (self.static / "index.css").write_text("body { color: red }")
+        new = self.sync()
+        self.assertNotEqual(old["index.css"], new["index.css"])
+        self.assertEqual(old["images/tom.png"], new["images/tom.png"])
+        self.assertFalse((self.docs / old["index.css"]).exists())
+        self.assertEqual((self.docs / new["index.css"]).read_text(), "body { color: red }")
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        path = str(self.root / "assets.json")
+        first = fingerprint_assets(self.static, path)
+        with mock.patch("assets.hash_file") as hash_file:
+            self.assertEqual(fingerprint_assets(self.static, path), first)
+            hash_file.assert_not_called()
+
+    def test_template_and_nodes_use_the_asset_map(self):
+        assets = {"index.css": "index.abc.css", "images/tom.png": "images/tom.abc.png"}
+        template = Template('<link href="/index.css" /><a href="/blog/">blog</a>{{ Content }}', "/site/", assets=assets)
+        self.assertEqual(template.literals[0], '<link href="/site/index.abc.css" /><a href="/site/blog/">blog</a>')
+        self.assertNotEqual(assets_hash(assets), assets_hash({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
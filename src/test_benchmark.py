@@ -0,0 +1,55 @@
+import unittest
+from benchmark import *
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpora_convert(self):
+        for name, corpus in CORPORA.items():
+            with self.subTest(corpus=name):
+                pages = corpus(1)
+                self.assertTrue(pages)
+                markdown_to_html_node(pages[0]).to_html()
+
+    def test_run_benchmarks_reports_every_stage(self):
+        results = run_benchmarks(["many_small_pages"], scale=1, repeat=1)
+        self.assertEqual(len(results), 8)
+        for result in results.values():
+            self.assertGreater(result["mb_per_s"], 0)
+            self.assertGreater(result["pages_per_s"], 0)
+            self.assertGreaterEqual(result["peak_kb"], 0)
+
+    def test_setup_runs_before_every_timed_call(self):
+        calls = []
+        time_stage(lambda: calls.append("call"), 1, min_seconds=0, setup=lambda: calls.append("setup"))
+        self.assertEqual(calls, ["setup", "call"])
+
+    def test_stages_are_timed_with_a_cold_memo(self):
+        markdown_to_html_node("# Heading\n\nplain text")
+        self.assertGreater(inline_fragment.cache_info().currsize, 0)
+        clear_inline_memos()
+        self.assertEqual(inline_fragment.cache_info().currsize, 0)
+
+    def test_minified_sizes(self):
+        plain, minified = minified_sizes(["many_small_pages"])["many_small_pages"]
+        self.assertLess(minified, plain)
+
+    def test_compare_results(self):
+        baseline = {
+            "a/to_html": {"mb_per_s": 10.0, "peak_kb": 100},
+            "b/to_html": {"mb_per_s": 10.0, "peak_kb": 100},
+            "c/to_html": {"mb_per_s": 10.0, "peak_kb": 100},
+        }
+        current = {
+            "a/to_html": {"mb_per_s": 9.5, "peak_kb": 105},
+            "b/to_html": {"mb_per_s": 5.0, "peak_kb": 100},
+            "c/to_html": {"mb_per_s": 10.0, "peak_kb": 200},
+            "d/to_html": {"mb_per_s": 1.0, "peak_kb": 1},
+        }
+        regressions = compare_results(baseline, current, 0.1)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("b/to_html: throughput"))
+        self.assertTrue(regressions[1].startswith("c/to_html: peak memory"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import random
 import unittest
 from block_splitter import *
 from htmlnode import ParentNode, HTMLNode, LeafNode
@@ -149,6 +150,111 @@ This is the same paragraph on a new line
         self.assertEqual(block_to_block_type("This is just a paragraph."), BlockType.PARAGRAPH)
         self.assertEqual(block_to_block_type("Hello world!"), BlockType.PARAGRAPH)
 
+    def test_fenced_code_with_blank_lines(self):
+        md = "Intro\n\n```python\ndef f():\n\n    return 1\n```\n\nAfter"
+        self.assertEqual(
+            markdown_to_blocks(md),
+            ["Intro", "```python\ndef f():\n\n    return 1\n```", "After"],
+        )
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><p>Intro</p><pre><code>def f():\n\n    return 1\n</code></pre><p>After</p></div>",
+        )
+
+    def test_single_line_code_block(self):
+        self.assertEqual(
+            markdown_to_html_node("```print('hello')```").to_html(),
+            "<div><pre><code>print('hello')</code></pre></div>",
+        )
+
+    def test_unclosed_fence_runs_to_end(self):
+        md = "```\ncode\n\nmore"
+        self.assertEqual(list(split_blocks(md)), [(BlockType.CODE, md)])
+        self.assertEqual(list(iter_blocks(md.split("\n"))), [(BlockType.CODE, md)])
+
+    def test_iter_blocks_types(self):
+        md = "# Title\n\n> quote\n> more\n\n- a\n- b\n\n1. one\n2. two\n\ntext"
+        self.assertEqual(
+            [block_type for block_type, _ in split_blocks(md)],
+            [
+                BlockType.HEADING,
+                BlockType.QUOTE,
+                BlockType.UNORDERED_LIST,
+                BlockType.ORDERED_LIST,
+                BlockType.PARAGRAPH,
+            ],
+        )
+
+    def test_iter_blocks_accepts_file_lines(self):
+        lines = ["# Title\r\n", "\n", "body\n"]
+        self.assertEqual(
+            list(iter_blocks(lines)),
+            [(BlockType.HEADING, "# Title"), (BlockType.PARAGRAPH, "body")],
+        )
+
+    def test_split_blocks_matches_line_scanner(self):
+        pieces = ["# h", "text", "> q", "- a", "1. b", "", "", "   ", "```", "```py", "x```", "```x```", "  indented"]
+        rng = random.Random(11)
+        for _ in range(2000):
+            md = "\n".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+            self.assertEqual(list(split_blocks(md)), list(iter_blocks(md.split("\n"))), md)
+
+    def test_streamed_document_matches_tree(self):
+        md = "# Title\n\n```\na\n\nb\n```\n\n> quote\n\nA paragraph\n\n1. one\n2. [two](/two)\n\nlast"
+        for minify in (False, True):
+            self.assertEqual(
+                StreamedDocument(md.splitlines(keepends=True)).to_html(minify),
+                markdown_to_html_node(md).to_html(minify),
+            )
+
+    def test_markdown_to_page(self):
+        result = markdown_to_page("Intro with [a link](/x)\n\n## Sub\n\n# Main title \n\nSecond")
+        self.assertEqual(result.title, "Main title")
+        self.assertEqual(result.description, "Intro with a link")
+        self.assertEqual(result.node.to_html(), markdown_to_html_node("Intro with [a link](/x)\n\n## Sub\n\n# Main title \n\nSecond").to_html())
+        self.assertIsNone(markdown_to_page("## only h2").title)
+
+    def test_scan_page_stops_early(self):
+        blocks = iter(split_blocks("# Title\n\nFirst **para**\n\nrest\n\nmore"))
+        result = scan_page(blocks)
+        self.assertEqual((result.title, result.description, result.node), ("Title", "First para", None))
+        self.assertEqual(next(blocks), (BlockType.PARAGRAPH, "rest"))
+
+    def test_lists_and_quote_to_html(self):
+        md = "> first\n>\n> second\n\n- a **b**\n- c\n\n1. one\n10. ten"
+        self.assertEqual(
+            markdown_to_html_node(md).to_html(),
+            "<div><blockquote>first\nsecond</blockquote>"
+            "<ul><li>a <b>b</b></li><li>c</li></ul>"
+            "<ol><li>one</li><li>ten</li></ol></div>",
+        )
+
+    def test_inline_fragments_are_memoized(self):
+        before = inline_cache_counts()
+        first = text_to_children("a **memo** test")
+        second = text_to_children("a **memo** test")
+        after = inline_cache_counts()
+        self.assertEqual(after["inline_cache_misses"] - before["inline_cache_misses"], 1)
+        self.assertEqual(after["inline_cache_hits"] - before["inline_cache_hits"], 1)
+        self.assertIsNot(first, second)
+        self.assertIs(first[1], second[1])
+        self.assertEqual(ParentNode("p", second).to_html(), "<p>a <b>memo</b> test</p>")
+
+    def test_batch_matches_per_call(self):
+        docs = ["# T\n\n- a\n- [b](/b)\n\n```\ncode\n```", "plain **text**", "", "> q\n\n1. one\n2. two"] * 5
+        for minify in (False, True):
+            expected = [markdown_to_html_node(md).to_html(minify) for md in docs]
+            self.assertEqual(list(markdown_to_html_batch(iter(docs), minify)), expected)
+            self.assertEqual(list(markdown_to_html_batch(docs, minify, jobs=2, chunksize=3)), expected)
+
+    def test_links_bypass_the_memo(self):
+        urls = []
+        resolve_url = lambda url: urls.append(url) or "/site" + url
+        for _ in range(2):
+            children = text_to_children("see [x](/x)", resolve_url)
+        self.assertEqual(urls, ["/x", "/x"])
+        self.assertEqual(children[1].props["href"], "/site/x")
+
 
     
 
@@ -0,0 +1,70 @@
+import gzip
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from compress import *
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.docs = self.root / "docs"
+        self.manifest_path = str(self.root / "cache" / "compress.json")
+        (self.docs / "blog").mkdir(parents=True)
+        (self.docs / "index.html").write_text("<p>home</p>" * 50)
+        (self.docs / "blog" / "post.html").write_text("<p>post</p>" * 50)
+        (self.docs / "index.css").write_text("body { margin: 0 }")
+        (self.docs / "logo.png").write_bytes(b"\x89PNG")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def compress(self, **kwargs):
+        return compress_outputs(self.docs, self.manifest_path, encoders={".gz": gzip_bytes}, **kwargs)
+
+    def test_writes_gzip_variants(self):
+        self.assertEqual(self.compress(), (3, 0, 0))
+        self.assertEqual(gzip.decompress((self.docs / "index.html.gz").read_bytes()), (self.docs / "index.html").read_bytes())
+        self.assertFalse((self.docs / "logo.png.gz").exists())
+        self.assertEqual(
+            os.stat(self.docs / "index.css.gz").st_mtime_ns,
+            os.stat(self.docs / "index.css").st_mtime_ns,
+        )
+
+    def test_unchanged_files_are_skipped(self):
+        self.compress()
+        self.assertEqual(self.compress(jobs=1), (0, 3, 0))
+        # Rewritten with the same content: the hash still matches.
+        (self.docs / "index.css").write_text("body { margin: 0 }")
+        os.utime(self.docs / "index.css", (0, 0))
+        self.assertEqual(self.compress(), (0, 3, 0))
+
+    def test_changed_and_missing_variants_are_redone(self):
+        self.compress()
+        (self.docs / "index.css").write_text("body { margin: 1px }")
+        (self.docs / "blog" / "post.html.gz").unlink()
+        self.assertEqual(self.compress(), (2, 1, 0))
+        self.assertEqual(gzip.decompress((self.docs / "index.css.gz").read_bytes()), b"body { margin: 1px }")
+
+    def test_stale_variants_are_removed(self):
+        self.compress()
+        (self.docs / "blog" / "post.html").unlink()
+        self.assertEqual(self.compress(), (0, 2, 1))
+        self.assertFalse((self.docs / "blog" / "post.html.gz").exists())
+
+    def test_remove_compressed_outputs(self):
+        self.compress()
+        self.assertEqual(remove_compressed_outputs(self.docs, self.manifest_path), 3)
+        self.assertEqual(list(self.docs.rglob("*.gz")), [])
+        self.assertFalse(os.path.exists(self.manifest_path))
+        self.assertEqual(remove_compressed_outputs(self.docs, self.manifest_path), 0)
+
+    def test_gzip_is_deterministic(self):
+        self.assertEqual(gzip_bytes(b"x" * 100), gzip_bytes(b"x" * 100))
+        self.assertIn(".gz", available_encoders())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from doc_cache import *
+from main import page_values
+from template import Template
+
+
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = DocumentCache(os.path.join(self.tmp.name, "documents"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_content(self):
+        self.assertEqual(self.cache.key("# A"), self.cache.key("# A"))
+        self.assertNotEqual(self.cache.key("# A"), self.cache.key("# B"))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get(self.cache.key("# A")))
+
+    def test_put_and_get(self):
+        entry = make_entry("Title", {"date": "2024"}, f'<a href="{BASEPATH_MARKER}x">x</a>')
+        self.cache.put("ab" * 32, entry)
+        self.assertEqual(self.cache.get("ab" * 32), entry)
+        self.assertEqual(entry_body(entry, "/site/"), '<a href="/site/x">x</a>')
+
+    def test_entry_body_applies_asset_map(self):
+        entry = make_entry("Title", {}, f'<img src="{marker_resolver("/a.png")}"><a href="{marker_resolver("/b")}">')
+        self.assertEqual(entry_body(entry, "/site/", {"a.png": "a.123.png"}), '<img src="/site/a.123.png"><a href="/site/b">')
+
+    def test_prune_evicts_least_recently_used(self):
+        self.cache.max_bytes = 0
+        for i, key in enumerate(["aa" * 32, "bb" * 32, "cc" * 32]):
+            self.cache.put(key, make_entry(str(i), {}, "x" * 100))
+            os.utime(self.cache.path(key), ns=(i, i))
+        size = os.path.getsize(self.cache.path("aa" * 32))
+        self.cache.max_bytes = size * 2
+        self.cache.get("aa" * 32)
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertIsNotNone(self.cache.get("aa" * 32))
+        self.assertIsNone(self.cache.get("bb" * 32))
+        self.assertIsNotNone(self.cache.get("cc" * 32))
+
+    def test_page_values_reuses_body_across_basepaths(self):
+        md = "---\ndate: 2024\n---\n# Home\n\n[post](/blog/post) and [ext](https://a.com)"
+        first = page_values(md, Template("{{ Content }}", "/"), cache=self.cache)
+        self.assertEqual(first["title"], "Home")
+        self.assertEqual(first["date"], "2024")
+        with mock.patch("main.markdown_to_page") as convert:
+            second = page_values(md, Template("{{ Content }}", "/site/"), cache=self.cache)
+            convert.assert_not_called()
+        self.assertEqual(
+            second["content"],
+            '<div><h1>Home</h1><p><a href="/site/blog/post">post</a> and <a href="https://a.com">ext</a></p></div>',
+        )
+        self.assertEqual(first["content"], page_values(md, Template("{{ Content }}", "/"))["content"].to_html())
+
+
+if __name__ == "__main__":
+    unittest.main()
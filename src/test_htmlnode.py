@@ -1,3 +1,5 @@
+import pickle
+import io
 import unittest
 from htmlnode import HTMLNode, LeafNode, ParentNode
 
@@ -79,6 +81,68 @@ class TestHTMLNode(unittest.TestCase):
             "<div><span><b>grandchild</b></span></div>",
         )
 
+    def test_iter_html_fragments(self):
+        parent_node = ParentNode("ul", [ParentNode("li", [LeafNode(None, "one")]), LeafNode("li", "two")])
+        self.assertEqual(
+            list(parent_node.iter_html()),
+            ["<ul>", "<li>", "one", "</li>", "<li>two</li>", "</ul>"],
+        )
+
+    def test_write_html(self):
+        parent_node = ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")], {"class": "x"})
+        out = io.StringIO()
+        parent_node.write_html(out)
+        self.assertEqual(out.getvalue(), '<p class="x"><b>bold</b> text</p>')
+        self.assertEqual(out.getvalue(), parent_node.to_html())
+
+    def test_deep_tree_does_not_recurse(self):
+        node = LeafNode("b", "x")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span>" * 5000 + "<b>x</b>"))
+
+    def test_nested_missing_children_raises(self):
+        parent_node = ParentNode("div", [ParentNode("p", None)])
+        with self.assertRaises(ValueError):
+            parent_node.to_html()
+
+    def test_nodes_have_no_instance_dict(self):
+        for node in (HTMLNode("p"), LeafNode("b", "x"), ParentNode("div", [])):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_pickle_round_trip(self):
+        parent_node = ParentNode("p", [LeafNode("a", "link", {"href": "/x"})])
+        self.assertEqual(pickle.loads(pickle.dumps(parent_node)).to_html(), parent_node.to_html())
+
+    def test_minified_props_and_void_tags(self):
+        node = LeafNode("img", "", {"src": "/a.png", "alt": "a picture", "title": ""})
+        self.assertEqual(node.to_html(minify=True), '<img src=/a.png alt="a picture" title="">')
+
+    def test_minified_optional_end_tags(self):
+        node = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "one\n  two")]),
+            ParentNode("ul", [ParentNode("li", [LeafNode(None, "a")]), ParentNode("li", [LeafNode(None, "b")])]),
+            ParentNode("p", [LeafNode(None, "followed by text")]),
+            LeafNode(None, "text"),
+            ParentNode("p", [LeafNode("a", "last", {"href": "x y"})]),
+        ])
+        self.assertEqual(
+            node.to_html(minify=True),
+            '<div><p>one two<ul><li>a<li>b</ul><p>followed by text</p>text<p><a href="x y">last</a></div>',
+        )
+
+    def test_minify_keeps_preformatted_text(self):
+        node = ParentNode("div", [ParentNode("pre", [ParentNode("code", [LeafNode(None, "  a\n\n  b\n")])])])
+        self.assertEqual(node.to_html(minify=True), "<div><pre><code>  a\n\n  b\n</code></pre></div>")
+        self.assertEqual(LeafNode("code", "a  b").to_html(minify=True), "<code>a  b</code>")
+
+    def test_minified_root_end_tag_needs_context(self):
+        node = ParentNode("p", [LeafNode(None, "x")])
+        self.assertEqual(node.to_html(minify=True), "<p>x</p>")
+        self.assertEqual("".join(node.iter_minified_html("div", ParentNode("ul", []))), "<p>x")
+        self.assertEqual("".join(node.iter_minified_html("div", LeafNode(None, "y"))), "<p>x</p>")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from images import *
+from textnode import TextNode, TextType
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + struct.pack(">II", width, height) + b"\x08\x06\x00\x00\x00"
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    return b"\xff\xd8" + app0 + b"\xff\xc0" + struct.pack(">HBHH", 17, 8, height, width) + b"\x00" * 12
+
+
+def fake_resize(task):
+    _, dest_path, width = task
+    Path(dest_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(dest_path).write_bytes(png(width, width))
+    return dest_path
+
+
+class TestImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        self.docs = self.root / "docs"
+        self.manifest_path = str(self.root / "cache" / "images.json")
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "images" / "tom.png").write_bytes(png(1200, 800))
+        (self.static / "images" / "icon.jpg").write_bytes(jpeg(64, 32))
+        (self.static / "index.css").write_text("body {}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def process(self):
+        return process_images(self.static, self.docs, self.manifest_path, jobs=1, widths=(480, 960))
+
+    def test_image_size(self):
+        self.assertEqual(image_size(self.static / "images" / "tom.png"), (1200, 800))
+        self.assertEqual(image_size(self.static / "images" / "icon.jpg"), (64, 32))
+        (self.root / "a.gif").write_bytes(b"GIF89a" + struct.pack("<HH", 10, 20) + b"\x00" * 10)
+        self.assertEqual(image_size(self.root / "a.gif"), (10, 20))
+        self.assertIsNone(image_size(self.static / "index.css"))
+
+    def test_dimensions_without_pillow(self):
+        with mock.patch("images.Image", None):
+            result = self.process()
+        self.assertEqual(result["images/tom.png"], {"width": 1200, "height": 800, "variants": []})
+        self.assertNotIn("index.css", result)
+
+    def test_variants_are_cached_by_source_hash(self):
+        with mock.patch("images.Image", object()), mock.patch("images.resize_image", side_effect=fake_resize) as resize:
+            result = self.process()
+            self.assertEqual(resize.call_count, 2)
+            variants = result["images/tom.png"]["variants"]
+            self.assertEqual([width for width, _ in variants], [480, 960])
+            self.assertTrue(all((self.docs / name).exists() for _, name in variants))
+            self.assertEqual(result["images/icon.jpg"]["variants"], [])
+            with mock.patch("images.image_size") as size:
+                self.assertEqual(self.process(), result)
+                size.assert_not_called()
+            self.assertEqual(resize.call_count, 2)
+            (self.static / "images" / "tom.png").write_bytes(png(600, 400))
+            changed = self.process()
+        self.assertEqual([width for width, _ in changed["images/tom.png"]["variants"]], [480])
+        self.assertFalse((self.docs / variants[1][1]).exists())
+
+    def test_image_resolver(self):
+        image_map = {"images/tom.png": {"width": 1200, "height": 800, "variants": [[480, "images/tom-480w.abc.png"]]}}
+        resolve_image = image_resolver(image_map, lambda url: "/site" + url)
+        self.assertEqual(
+            resolve_image("/images/tom.png"),
+            {
+                "width": "1200",
+                "height": "800",
+                "srcset": "/site/images/tom-480w.abc.png 480w, /site/images/tom.png 1200w",
+                "sizes": "(max-width: 1200px) 100vw, 1200px",
+                "loading": "lazy",
+            },
+        )
+        self.assertIsNone(resolve_image("https://example.com/a.png"))
+        node = TextNode.text_node_to_html_node(TextNode("Tom", TextType.IMAGE, "/images/tom.png"), None, resolve_image)
+        self.assertEqual(node.props["width"], "1200")
+        self.assertEqual(node.props["alt"], "Tom")
+
+
+if __name__ == "__main__":
+    unittest.main()
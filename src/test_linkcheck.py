@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from pathlib import Path
+from block_splitter import markdown_to_page
+from linkcheck import *
+
+
+INDEX = {
+    "pages": {
+        "index.md": {"url": "/"},
+        "blog/tom/index.md": {"url": "/blog/tom/"},
+        "about.md": {"url": "/about.html"},
+    },
+    "listings": {"blog/index.html": "signature"},
+}
+
+
+class TestLinkCheck(unittest.TestCase):
+    def test_links_are_recorded_while_nodes_are_built(self):
+        links = set()
+        resolve_url = link_recorder(lambda url: "/site" + url, links)
+        result = markdown_to_page("# T\n\n[a](/about) ![b](/images/b.png) [c](https://x.com)", resolve_url)
+        self.assertEqual(links, {"/about", "/images/b.png", "https://x.com"})
+        self.assertEqual(result.node.children[1].children[0].props["href"], "/site/about")
+
+    def test_link_path(self):
+        self.assertEqual(link_path("/blog/tom", "/"), "/blog/tom")
+        self.assertEqual(link_path("../about.html#top", "/blog/tom/"), "/blog/about.html")
+        self.assertEqual(link_path("./", "/blog/tom/"), "/blog/tom/")
+        self.assertEqual(link_path("/a%20b.png", "/"), "/a b.png")
+        self.assertIsNone(link_path("https://example.com/x", "/"))
+        self.assertIsNone(link_path("mailto:me@example.com", "/"))
+        self.assertIsNone(link_path("#section", "/"))
+
+    def test_site_targets(self):
+        targets = site_targets(INDEX, {"index.css": None})
+        for path in ["/", "/index.html", "/blog/tom", "/blog/tom/", "/about", "/about.html", "/blog/", "/index.css"]:
+            self.assertIn(path, targets)
+
+    def test_find_broken_links(self):
+        links = {
+            "index.md": ["/blog/tom", "/about", "/index.css", "/sitemap.xml", "https://x.com", "/missing"],
+            "blog/tom/index.md": ["../", "../../about.html", "other.html"],
+            "gone.md": ["/missing"],
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "sitemap.xml").write_text("<urlset/>")
+            broken = find_broken_links(INDEX, links, {"index.css": None}, tmp)
+        self.assertEqual(broken, [("blog/tom/index.md", "other.html"), ("index.md", "/missing")])
+
+
+if __name__ == "__main__":
+    unittest.main()
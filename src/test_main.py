@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from main import *
+
+
+TEMPLATE = "<title>{{ Title }}</title><article>{{ Content }}</article>"
+
+
+class TestParallelBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.template = self.root / "template.html"
+        self.template.write_text(TEMPLATE)
+        for i in range(6):
+            page = self.content / f"section{i % 2}" / f"page{i}.md"
+            page.parent.mkdir(parents=True, exist_ok=True)
+            page.write_text(f"# Page {i}\n\nSee [home](/index) and **bold** {i}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, directory):
+        return {
+            path.relative_to(directory).as_posix(): path.read_text()
+            for path in sorted(Path(directory).rglob("*.html"))
+        }
+
+    def test_find_markdown_files_is_sorted(self):
+        files = find_markdown_files(self.content)
+        self.assertEqual(files, sorted(files))
+        self.assertEqual(len(files), 6)
+
+    def test_parallel_matches_serial(self):
+        serial = self.root / "serial"
+        parallel = self.root / "parallel"
+        generate_pages_recursive(self.content, self.template, serial, "/base/")
+        generate_pages_parallel(self.content, self.template, parallel, "/base/", 3)
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+        self.assertIn('href="/base/index"', self.read_tree(parallel)["section0/page0.html"])
+
+    def test_failures_are_aggregated(self):
+        (self.content / "section0" / "bad1.md").write_text("no heading here")
+        (self.content / "section1" / "bad2.md").write_text("still no heading")
+        docs = self.root / "docs"
+        with self.assertRaises(BuildError) as ctx:
+            generate_pages_parallel(self.content, self.template, docs, "/", 2)
+        failed = [Path(source).name for source, _ in ctx.exception.failures]
+        self.assertEqual(failed, ["bad1.md", "bad2.md"])
+        self.assertIn("No h1 was provided", str(ctx.exception))
+        # The good pages are still written.
+        self.assertEqual(len(self.read_tree(docs)), 6)
+
+    def test_streamed_pages_match(self):
+        (self.content / "section0" / "big.md").write_text(
+            "---\ntitle: ignored\ndate: 2024\n---\nIntro\n\n# Big\n\n```\ncode\n\nmore\n```\n\n- a\n- [b](/b)\n"
+        )
+        whole = self.root / "whole"
+        streamed = self.root / "streamed"
+        generate_pages_parallel(self.content, self.template, whole, "/base/", 1)
+        stats = BuildStats()
+        generate_pages_parallel(self.content, self.template, streamed, "/base/", 1, stats, stream_threshold=0)
+        self.assertEqual(self.read_tree(whole), self.read_tree(streamed))
+        self.assertIn("<title>Big</title>", self.read_tree(streamed)["section0/big.html"])
+        self.assertGreater(stats.totals["inline_parse"], 0)
+
+    def test_overlapped_io_matches_inline(self):
+        (self.content / "section0" / "big.md").write_text("# Big\n\nStreamed [x](/x)")
+        inline = self.root / "inline"
+        overlapped = self.root / "overlapped"
+        links = {}
+        generate_pages_parallel(self.content, self.template, inline, "/base/", 1, io_jobs=0)
+        # A tiny buffer makes every read and write wait for the one before.
+        generate_pages_parallel(self.content, self.template, overlapped, "/base/", 1, stream_threshold=20, links=links, io_jobs=3, io_buffer=0)
+        self.assertEqual(self.read_tree(inline), self.read_tree(overlapped))
+        self.assertEqual(len(links), 7)
+        self.assertEqual(list(overlapped.rglob("*.tmp")), [])
+
+    def test_overlapped_write_failures_are_reported(self):
+        docs = self.root / "docs"
+        # A directory where section1/ should be makes its pages unwritable.
+        docs.mkdir()
+        (docs / "section1").write_text("not a directory")
+        links = {}
+        with self.assertRaises(BuildError) as ctx:
+            generate_pages_parallel(self.content, self.template, docs, "/", 1, links=links, io_jobs=2)
+        failed = [Path(source).name for source, _ in ctx.exception.failures]
+        self.assertEqual(failed, ["page1.md", "page3.md", "page5.md"])
+        self.assertEqual(sorted(Path(source).name for source in links), ["page0.md", "page2.md", "page4.md"])
+
+    def test_search_terms_collected(self):
+        terms = {}
+        cache = DocumentCache(str(self.root / "cache"))
+        for _ in range(2):
+            generate_pages_parallel(self.content, self.template, self.root / "docs", "/", 2, cache=cache, terms=terms)
+            self.assertEqual(len(terms), 6)
+            self.assertEqual(terms[self.content / "section0" / "page2.md"], ["and", "bold", "home", "page", "see"])
+        streamed = {}
+        generate_pages_parallel(self.content, self.template, self.root / "docs", "/", 1, stream_threshold=0, terms=streamed)
+        self.assertEqual(streamed, terms)
+
+    def test_links_collected(self):
+        links = {}
+        cache = DocumentCache(str(self.root / "cache"))
+        for _ in range(2):
+            generate_pages_parallel(self.content, self.template, self.root / "docs", "/base/", 2, cache=cache, links=links)
+            self.assertEqual(links[self.content / "section0" / "page2.md"], ["/index"])
+        streamed = {}
+        generate_pages_parallel(self.content, self.template, self.root / "docs", "/base/", 1, stream_threshold=0, links=streamed)
+        self.assertEqual(streamed, links)
+
+    def test_build_stats(self):
+        stats = BuildStats()
+        generate_pages_parallel(self.content, self.template, self.root / "docs", "/", 1, stats)
+        self.assertEqual(len(stats.pages), 6)
+        for timings in stats.pages.values():
+            self.assertEqual(
+                set(timings),
+                {"read", "block_split", "inline_parse", "tree_build", "serialize", "template", "write"},
+            )
+        report = stats.write_report(str(self.root / "report.json"))
+        self.assertEqual(report["pages"], 6)
+        counters = report["counters"]
+        # Every heading goes through the inline cache; the paragraphs have
+        # links, so they don't.
+        self.assertEqual(counters["inline_cache_hits"] + counters["inline_cache_misses"], 6)
+        self.assertGreater(report["stages"]["discovery"], 0)
+        seconds = [page["seconds"] for page in report["slowest_pages"]]
+        self.assertEqual(seconds, sorted(seconds, reverse=True))
+        with open(self.root / "report.json") as f:
+            self.assertEqual(json.load(f)["pages"], 6)
+
+    def test_parse_args_jobs(self):
+        self.assertEqual(parse_args(["/site/", "--jobs", "4"]).jobs, 4)
+        self.assertEqual(parse_args([]).basepath, "/")
+        self.assertGreaterEqual(parse_args(["--jobs", "0"]).jobs, 1)
+        self.assertEqual(parse_args([]).stream_threshold, DEFAULT_STREAM_THRESHOLD)
+        self.assertEqual(parse_args(["--io-jobs", "0"]).io_jobs, 0)
+
+    def test_parse_args_verbosity(self):
+        self.assertTrue(parse_args(["-q"]).quiet)
+        self.assertTrue(parse_args(["--verbose"]).verbose)
+        self.assertFalse(parse_args([]).quiet)
+
+
+class TestBuild(unittest.TestCase):
+    # build() uses the default ./docs, ./static and ./.build_cache paths,
+    # so these tests run inside a temporary directory.
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.page = Path("content/contact/index.md")
+        self.page.parent.mkdir(parents=True)
+        self.page.write_text("# Contact\n\nWrite to me")
+        Path("template.html").write_text(TEMPLATE)
+        Path("static").mkdir()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def build(self, *argv):
+        build(parse_args(["-q", *argv]), self.tmp.name, "./content", "./template.html", "./docs", BuildStats())
+        return Path("docs/contact/index.html").read_text()
+
+    def test_full_build_between_incremental_builds(self):
+        self.build("--incremental")
+        self.page.write_text("# Contact\n\nWrite to me, changed")
+        self.assertIn("changed", self.build())
+        self.page.write_text("# Contact\n\nWrite to me")
+        self.assertNotIn("changed", self.build("--incremental"))
+
+    def test_incremental_build_after_docs_are_removed(self):
+        self.build("--incremental", "--compress")
+        shutil.rmtree("docs")
+        self.build("--incremental", "--compress")
+        self.assertTrue(Path("docs/contact/index.html.gz").exists())
+        Path("docs/contact/index.html.gz").unlink()
+        self.build("--incremental", "--compress")
+        self.assertTrue(Path("docs/contact/index.html.gz").exists())
+
+    def test_compressed_copies_go_when_compression_is_turned_off(self):
+        self.build("--incremental", "--compress")
+        self.assertTrue(Path("docs/contact/index.html.gz").exists())
+        self.page.write_text("# Contact\n\nWrite to me, changed")
+        self.build("--incremental")
+        self.assertEqual(list(Path("docs").rglob("*.gz")), [])
+        self.build("--incremental", "--compress")
+        self.assertTrue(Path("docs/contact/index.html.gz").exists())
+
+    def test_search_terms_follow_edits_made_without_search(self):
+        self.build("--incremental", "--search")
+        self.page.write_text("# Contact\n\nWrite to zzqqxx")
+        self.build("--incremental")
+        self.build("--incremental", "--search")
+        shards = "".join(path.read_text() for path in Path("docs/search").glob("*.json"))
+        self.assertIn("zzqqxx", shards)
+
+    def test_link_check_follows_edits_made_without_it(self):
+        self.build("--incremental", "--check-links")
+        self.page.write_text("# Contact\n\nSee [nowhere](/does-not-exist)")
+        self.build("--incremental")
+        with self.assertLogs("site_generator", "WARNING") as logs:
+            self.build("--incremental", "--check-links")
+        self.assertIn("Broken link in contact/index.md: /does-not-exist", "\n".join(logs.output))
+
+    def test_link_check_knows_the_listings(self):
+        self.page.write_text("# Contact\n\nSee [the blog](/blog/)")
+        Path("content/blog").mkdir()
+        Path("content/blog/post.md").write_text("# Post")
+        stages = {stage.name: stage for stage in build_stages(parse_args(["--check-links"]), self.tmp.name, "./content", "./template.html", "./docs", BuildStats())}
+        index, _ = build_site_index("./content")
+        # Nothing is written to docs/, so only the listing set can find it.
+        inputs = {"index": index, "render": None, "listings": {"listings": ["blog/index.html"]}}
+        self.assertEqual(stages["links"].run(inputs), [])
+        inputs["listings"]["listings"] = []
+        self.assertEqual(stages["links"].run(inputs), [("contact/index.md", "/blog/")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from manifest import *
+from main import BuildError, generate_pages_incremental
+
+
+TEMPLATE = "<title>{{ Title }}</title><article>{{ Content }}</article>"
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.docs = self.root / "docs"
+        self.template = self.root / "template.html"
+        self.manifest_path = str(self.root / "cache" / "manifest.json")
+        (self.content / "blog").mkdir(parents=True)
+        (self.content / "index.md").write_text("# Home\n\nWelcome")
+        (self.content / "blog" / "post.md").write_text("# Post\n\nHello")
+        self.template.write_text(TEMPLATE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, basepath="/"):
+        return generate_pages_incremental(
+            self.content, self.template, self.docs, basepath, self.manifest_path
+        )
+
+    def test_save_and_load_round_trip(self):
+        manifest = new_manifest()
+        manifest["pages"]["index.md"] = page_entry("a", "b", "/", "docs/index.html")
+        save_manifest(manifest, self.manifest_path)
+        self.assertEqual(load_manifest(self.manifest_path), manifest)
+
+    def test_load_rejects_other_version(self):
+        manifest = new_manifest()
+        manifest["version"] = "0-old"
+        save_manifest(manifest, self.manifest_path)
+        self.assertIsNone(load_manifest(self.manifest_path))
+
+    def test_load_rejects_garbage(self):
+        os.makedirs(os.path.dirname(self.manifest_path))
+        with open(self.manifest_path, "w") as f:
+            f.write("{not json")
+        self.assertIsNone(load_manifest(self.manifest_path))
+
+    def test_first_build_renders_everything(self):
+        manifest = self.build()
+        self.assertEqual(sorted(manifest["pages"]), ["blog/post.md", "index.md"])
+        self.assertIn("<h1>Home</h1>", (self.docs / "index.html").read_text())
+        self.assertTrue((self.docs / "blog" / "post.html").exists())
+
+    def test_unchanged_pages_are_not_rewritten(self):
+        self.build()
+        post = self.docs / "blog" / "post.html"
+        os.utime(post, (0, 0))
+        (self.content / "index.md").write_text("# Home\n\nWelcome back")
+        self.build()
+        self.assertEqual(post.stat().st_mtime, 0)
+        self.assertIn("Welcome back", (self.docs / "index.html").read_text())
+
+    def test_template_change_rerenders(self):
+        self.build()
+        self.template.write_text("<main>{{ Content }}</main>")
+        self.build()
+        self.assertTrue((self.docs / "blog" / "post.html").read_text().startswith("<main>"))
+
+    def test_basepath_change_rerenders(self):
+        (self.content / "index.md").write_text("# Home\n\n[post](/blog/post)")
+        self.build()
+        self.build("/site/")
+        self.assertIn('href="/site/blog/post"', (self.docs / "index.html").read_text())
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        (self.content / "blog" / "post.md").unlink()
+        manifest = self.build()
+        self.assertFalse((self.docs / "blog" / "post.html").exists())
+        self.assertEqual(list(manifest["pages"]), ["index.md"])
+
+    def test_failed_page_keeps_its_output(self):
+        self.build()
+        post = self.content / "blog" / "post.md"
+        post.write_text("# Post\n\nHello **unclosed")
+        with self.assertRaises(BuildError):
+            self.build()
+        self.assertIn("Hello", (self.docs / "blog" / "post.html").read_text())
+        # Still retried, and still removed with its source.
+        with self.assertRaises(BuildError):
+            self.build()
+        post.unlink()
+        manifest = self.build()
+        self.assertFalse((self.docs / "blog" / "post.html").exists())
+        self.assertEqual(list(manifest["pages"]), ["index.md"])
+
+    def test_missing_output_is_rebuilt(self):
+        self.build()
+        (self.docs / "index.html").unlink()
+        self.build()
+        self.assertTrue((self.docs / "index.html").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
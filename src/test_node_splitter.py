@@ -1,3 +1,4 @@
+import random
 import unittest
 from node_splitter import *
 
@@ -160,5 +161,62 @@ class TestTextNodeToHTMLNode(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class TestInlineScanner(unittest.TestCase):
+    CASES = [
+        "",
+        "Hello, world!",
+        "This is **bold** text.",
+        "Some _italic_ word.",
+        "Use `print()` to output.",
+        "Here is an image ![cat](http://cat.com/cat.jpg)",
+        "Check this [link](http://example.com)",
+        "Here is a **bold** word and an _italic_ one. Also `code`, a [link](http://a.com), and ![img](http://img.com/img.png).",
+        "![start](https://example.com/start.png) some text ![end](https://example.com/end.png)",
+        "This is ![not an image](missing end",
+        "**bold with _italic_ inside**",
+        "***a***",
+        "****",
+        "[a](b)[c](d)![e](f)",
+        "_x_ [link **text**](url) `y`",
+        # Images are taken before links, so this is no link.
+        "[b](a![_)](ax)",
+    ]
+
+    def test_matches_legacy_chain(self):
+        for text in self.CASES:
+            with self.subTest(text=text):
+                self.assertListEqual(scan_inline(text), text_to_textnodes_legacy(text))
+
+    def test_matches_legacy_chain_on_generated_text(self):
+        piece_sets = [
+            ["a", " ", "**", "_", "`", "*", "[", "]", "(", ")", "!", "![x](u)", "[l](v)"],
+            # Images overlapping links.
+            ["[b](", "a", "![", "_)", "](", "ax)", ")", "[", "]", "(", "!", "_", " ", "](x)"],
+        ]
+        rng = random.Random(7)
+        for pieces in piece_sets:
+            for _ in range(2000):
+                text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+                try:
+                    expected = text_to_textnodes_legacy(text)
+                except ValueError:
+                    continue
+                self.assertListEqual(scan_inline(text), expected, text)
+
+    def test_unclosed_delimiter(self):
+        with self.assertRaises(ValueError):
+            scan_inline("This is **not closed")
+
+    def test_delimiters_do_not_cross_links(self):
+        with self.assertRaises(ValueError):
+            scan_inline("a_b [x](y) c_d")
+
+    def test_long_paragraph(self):
+        text = "word [link](http://a.com) **b** " * 5000
+        nodes = scan_inline(text)
+        self.assertEqual(len(nodes), 5000 * 4 + 1)
+        self.assertEqual(nodes[1], TextNode("link", TextType.LINK, "http://a.com"))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from pathlib import Path
+from page_io import *
+
+
+class TestPageIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_atomic_open_replaces_the_file(self):
+        path = self.dir / "page.html"
+        path.write_text("old")
+        with atomic_open(path) as f:
+            f.write("new")
+            self.assertEqual(path.read_text(), "old")
+        self.assertEqual(path.read_text(), "new")
+        self.assertEqual([p.name for p in self.dir.iterdir()], ["page.html"])
+
+    def test_atomic_open_keeps_the_old_file_on_errors(self):
+        path = self.dir / "page.html"
+        path.write_text("old")
+        with self.assertRaises(RuntimeError):
+            with atomic_open(path) as f:
+                f.write("half")
+                raise RuntimeError("render failed")
+        self.assertEqual(path.read_text(), "old")
+        self.assertEqual([p.name for p in self.dir.iterdir()], ["page.html"])
+
+    def test_atomic_open_drops_compressed_copies(self):
+        path = self.dir / "page.html"
+        path.write_text("old")
+        (self.dir / "page.html.gz").write_bytes(b"old")
+        (self.dir / "page.html.br").write_bytes(b"old")
+        with atomic_open(path) as f:
+            f.write("new")
+        self.assertEqual([p.name for p in self.dir.iterdir()], ["page.html"])
+
+    def test_write_text_creates_directories(self):
+        write_text(str(self.dir / "a" / "b" / "page.html"), "text")
+        self.assertEqual((self.dir / "a" / "b" / "page.html").read_text(), "text")
+
+    def test_prefetch_yields_in_order(self):
+        paths = [f"page{i}" for i in range(20)]
+        futures = prefetch(paths, lambda path: path.upper(), jobs=4)
+        self.assertEqual([future.result() for future in futures], [path.upper() for path in paths])
+
+    def test_prefetch_is_bounded_by_bytes(self):
+        started = []
+        futures = prefetch(range(20), lambda path: started.append(path) or "x" * 10, jobs=4, max_bytes=25)
+        for consumed, future in enumerate(futures):
+            self.assertEqual(future.result(), "x" * 10)
+            # Three buffered reads reach max_bytes; at most jobs more were
+            # already running.
+            self.assertLessEqual(len(started) - consumed, 3 + 4)
+        self.assertEqual(len(started), 20)
+
+    def test_prefetch_with_no_buffer_reads_one_at_a_time(self):
+        futures = prefetch(["a", "b"], lambda path: path, jobs=4, max_bytes=0)
+        self.assertEqual([future.result() for future in futures], ["a", "b"])
+
+    def test_prefetch_passes_errors_on(self):
+        def read(path):
+            if path == "bad":
+                raise OSError("unreadable")
+            return path
+
+        results = []
+        for future in prefetch(["a", "bad", "b"], read, jobs=2):
+            results.append(future.exception() or future.result())
+        self.assertEqual(results[0], "a")
+        self.assertIsInstance(results[1], OSError)
+        self.assertEqual(results[2], "b")
+
+    def test_page_writer(self):
+        with PageWriter(jobs=3, max_bytes=8) as writer:
+            for i in range(10):
+                writer.write(str(self.dir / "pages" / f"{i}.html"), f"page {i}")
+        for i in range(10):
+            self.assertEqual((self.dir / "pages" / f"{i}.html").read_text(), f"page {i}")
+        self.assertEqual(writer.failures, [])
+        self.assertEqual(writer.in_flight, 0)
+
+    def test_page_writer_collects_failures(self):
+        (self.dir / "blocked").write_text("a file, not a directory")
+        writer = PageWriter(jobs=2)
+        writer.write(str(self.dir / "blocked" / "page.html"), "x", key="page.md")
+        writer.write(str(self.dir / "ok.html"), "y")
+        failures = writer.close()
+        self.assertEqual([key for key, _ in failures], ["page.md"])
+        self.assertEqual((self.dir / "ok.html").read_text(), "y")
+
+
+if __name__ == "__main__":
+    unittest.main()
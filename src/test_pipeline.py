@@ -0,0 +1,154 @@
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from pipeline import *
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.state_path = str(self.dir / "pipeline.json")
+        self.source = self.dir / "source.txt"
+        self.source.write_text("one")
+        self.output = self.dir / "output.txt"
+        self.calls = []
+
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+
+    def stages(self, params=None):
+        def read(inputs):
+            self.calls.append("read")
+            return self.source.read_text()
+
+        def write(inputs):
+            self.calls.append("write")
+            self.output.write_text(inputs["read"].upper())
+            return {"length": len(inputs["read"])}
+
+        return [
+            Stage("write", write, inputs=["read"], outputs=lambda result: [str(self.output)]),
+            Stage("read", read, paths=[str(self.source)], params=params),
+        ]
+
+
+    def test_stages_run_in_dependency_order(self):
+        results, skipped = Pipeline(self.stages(), self.state_path).run()
+        self.assertEqual(self.calls, ["read", "write"])
+        self.assertEqual(results, {"read": "one", "write": {"length": 3}})
+        self.assertEqual(skipped, [])
+        self.assertEqual(self.output.read_text(), "ONE")
+
+    def test_independent_stages_run_concurrently(self):
+        # Each waits for the other, so this only finishes if both run at once.
+        barrier = threading.Barrier(2, timeout=5)
+        stages = [Stage(name, lambda inputs: barrier.wait()) for name in ("a", "b")]
+        results, _ = Pipeline(stages, self.state_path).run()
+        self.assertEqual(sorted(results), ["a", "b"])
+
+    def test_unchanged_stages_are_skipped(self):
+        Pipeline(self.stages(), self.state_path).run()
+        self.calls.clear()
+        results, skipped = Pipeline(self.stages(), self.state_path).run()
+        self.assertEqual(self.calls, [])
+        self.assertEqual(skipped, ["read", "write"])
+        self.assertEqual(results["write"], {"length": 3})
+
+    def test_no_reuse_runs_everything(self):
+        Pipeline(self.stages(), self.state_path).run()
+        self.calls.clear()
+        _, skipped = Pipeline(self.stages(), self.state_path).run(reuse=False)
+        self.assertEqual(self.calls, ["read", "write"])
+        self.assertEqual(skipped, [])
+
+    def test_changed_path_reruns_stage_and_dependents(self):
+        Pipeline(self.stages(), self.state_path).run()
+        self.calls.clear()
+        self.source.write_text("three")
+        os.utime(self.source, ns=(0, 1))
+        Pipeline(self.stages(), self.state_path).run()
+        self.assertEqual(self.calls, ["read", "write"])
+        self.assertEqual(self.output.read_text(), "THREE")
+
+    def test_stage_that_runs_again_reruns_dependents(self):
+        # read's output is gone, so it runs again and returns the same
+        # result; write still has to follow.
+        copy = self.dir / "copy.txt"
+
+        def copy_source(inputs):
+            self.calls.append("read")
+            copy.write_text(self.source.read_text())
+            return "same"
+
+        def stages():
+            return [
+                Stage("read", copy_source, outputs=lambda result: [str(copy)]),
+                Stage("write", lambda inputs: self.calls.append("write"), inputs=["read"]),
+            ]
+
+        Pipeline(stages(), self.state_path).run()
+        copy.unlink()
+        self.calls.clear()
+        _, skipped = Pipeline(stages(), self.state_path).run()
+        self.assertEqual(self.calls, ["read", "write"])
+        self.assertEqual(skipped, [])
+
+    def test_changed_params_rerun_stage(self):
+        Pipeline(self.stages({"flag": False}), self.state_path).run()
+        self.calls.clear()
+        Pipeline(self.stages({"flag": True}), self.state_path).run()
+        self.assertEqual(self.calls, ["read", "write"])
+
+    def test_missing_output_reruns_stage(self):
+        Pipeline(self.stages(), self.state_path).run()
+        self.calls.clear()
+        self.output.unlink()
+        _, skipped = Pipeline(self.stages(), self.state_path).run()
+        self.assertEqual(self.calls, ["write"])
+        self.assertEqual(skipped, ["read"])
+        self.assertEqual(self.output.read_text(), "ONE")
+
+    def test_deferred_failure_is_raised_and_not_recorded(self):
+        calls = []
+
+        def flaky(inputs):
+            calls.append("flaky")
+            raise DeferredFailure("partial", RuntimeError("one page failed"))
+
+        def after(inputs):
+            calls.append("after")
+            return inputs["flaky"]
+
+        stages = [Stage("flaky", flaky), Stage("after", after, inputs=["flaky"])]
+        with self.assertRaisesRegex(RuntimeError, "one page failed"):
+            Pipeline(stages, self.state_path).run()
+        self.assertEqual(calls, ["flaky", "after"])
+        calls.clear()
+        # flaky wasn't recorded, so it runs again, and so does after.
+        with self.assertRaises(RuntimeError):
+            Pipeline(stages, self.state_path).run()
+        self.assertEqual(calls, ["flaky", "after"])
+
+    def test_failure_stops_dependents(self):
+        def broken(inputs):
+            raise ValueError("broken")
+
+        stages = [Stage("broken", broken), Stage("after", lambda inputs: self.calls.append("after"), inputs=["broken"])]
+        with self.assertRaisesRegex(ValueError, "broken"):
+            Pipeline(stages, self.state_path).run()
+        self.assertEqual(self.calls, [])
+
+    def test_cycles_and_unknown_stages_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            Pipeline([Stage("a", None, inputs=["b"]), Stage("b", None, after=["a"])], self.state_path)
+        with self.assertRaisesRegex(ValueError, "unknown"):
+            Pipeline([Stage("a", None, inputs=["b"])], self.state_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
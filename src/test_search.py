@@ -0,0 +1,41 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from block_splitter import markdown_to_html_node
+from search import *
+
+
+class TestSearch(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(tokenize("The Hobbit's 2nd a-ring"), ["the", "hobbit", "2nd", "ring"])
+
+    def test_page_terms_reads_leaves(self):
+        node = markdown_to_html_node("# Title\n\nSee [Frodo](/frodo) and ![Gandalf grey](/g.png)\n\n```\nsome_code\n```")
+        self.assertEqual(page_terms(node), ["and", "frodo", "gandalf", "grey", "see", "some_code", "title"])
+
+    def test_shard_round_trip(self):
+        postings = {"ring": [0, 3, 4], "rings": [3], "rivendell": [1, 7]}
+        entries = encode_shard(postings)
+        self.assertEqual(entries, [[0, "ring", [0, 3, 1]], [4, "s", [3]], [2, "vendell", [1, 6]]])
+        self.assertEqual(decode_shard(entries), postings)
+
+    def test_build_search_index(self):
+        documents, shards = build_search_index([("/b/", "B", ["ring", "elf"]), ("/a/", "A", ["ring"])])
+        self.assertEqual(documents, {"docs": [["/a/", "A"], ["/b/", "B"]], "shards": ["e", "r"]})
+        self.assertEqual(decode_shard(shards["r"]), {"ring": [0, 1]})
+
+    def test_write_search_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp) / SEARCH_DIR
+            directory.mkdir()
+            (directory / "x.json").write_text("[]")
+            terms, shards, size = write_search_index([("/a/", "A", ["ring", "_x"])], tmp)
+            self.assertEqual((terms, shards), (2, 2))
+            self.assertEqual(sorted(path.name for path in directory.iterdir()), ["_.json", "docs.json", "r.json", "search.js"])
+            self.assertEqual(size, sum(path.stat().st_size for path in directory.iterdir()))
+            self.assertEqual(json.loads((directory / "docs.json").read_text())["shards"], ["_", "r"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import tempfile
+import unittest
+from pathlib import Path
+from site_index import *
+from template import Template
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.docs = self.root / "docs"
+        (self.content / "blog").mkdir(parents=True)
+        (self.content / "index.md").write_text("# Home\n\nWelcome home.")
+        (self.content / "blog" / "old.md").write_text("---\ndate: 2023-02-01\ntags: Tolkien\n---\n# Old post")
+        (self.content / "blog" / "new.md").write_text(
+            "---\ndate: 2024-06-01\ntags: Tolkien, Elves\n---\n# New post\n\nAll about elves."
+        )
+        self.template = Template("<title>{{ Title }}</title>{{ Content }}", "/site/")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, old_index=None):
+        index, read = build_site_index(self.content, old_index)
+        return index, read, write_listings(index, old_index, self.template, self.docs)
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.md"), "/")
+        self.assertEqual(page_url("blog/tom/index.md"), "/blog/tom/")
+        self.assertEqual(page_url("blog/old.md"), "/blog/old.html")
+
+    def test_metadata_pass(self):
+        index, read, _ = self.build()
+        self.assertEqual(read, 3)
+        entry = index["pages"]["blog/new.md"]
+        self.assertEqual(entry["title"], "New post")
+        self.assertEqual(entry["description"], "All about elves.")
+        self.assertEqual(entry["tags"], ["Tolkien", "Elves"])
+        # Unchanged pages keep their entries without being read again.
+        again, read = build_site_index(self.content, index)
+        self.assertEqual((again["pages"], read), (index["pages"], 0))
+
+    def test_listing_pages(self):
+        index, _, written = self.build()
+        self.assertEqual(
+            sorted(index["listings"]),
+            ["archive/index.html", "blog/index.html", "tags/elves/index.html", "tags/index.html", "tags/tolkien/index.html"],
+        )
+        self.assertEqual(written, (5, 0, 0))
+        blog = (self.docs / "blog" / "index.html").read_text()
+        self.assertIn('<a href="/site/blog/new.html">New post</a> <time>2024-06-01</time>', blog)
+        self.assertLess(blog.index("New post"), blog.index("Old post"))
+        archive = (self.docs / "archive" / "index.html").read_text()
+        self.assertLess(archive.index("<h2>2024</h2>"), archive.index("<h2>2023</h2>"))
+
+    def test_content_page_wins_over_listing(self):
+        (self.content / "blog" / "index.md").write_text("# My blog")
+        index, _, _ = self.build()
+        self.assertNotIn("blog/index.html", index["listings"])
+        self.assertFalse((self.docs / "blog" / "index.html").exists())
+
+    def test_only_changed_listings_are_rewritten(self):
+        index, _, _ = self.build()
+        (self.content / "blog" / "old.md").write_text("---\ndate: 2023-02-01\n---\n# Old post")
+        index, read, written = self.build(index)
+        self.assertEqual(read, 1)
+        # Only tags/tolkien/ lists different pages now.
+        self.assertEqual(written, (1, 4, 0))
+        (self.content / "blog" / "new.md").write_text("# New post")
+        index, _, written = self.build(index)
+        self.assertEqual(written, (2, 0, 3))
+        self.assertEqual(list((self.docs / "tags").rglob("*.html")), [])
+
+    def test_failed_listing_keeps_the_old_file(self):
+        index, _, _ = self.build()
+        before = (self.docs / "archive" / "index.html").read_text()
+
+        class FailingTemplate(Template):
+            def render_to(self, out, values, timings=None):
+                out.write("<title>half")
+                raise RuntimeError("render failed")
+
+        with self.assertRaises(RuntimeError):
+            write_listings(dict(index, listings={}), index, FailingTemplate("<h1>{{ Title }}</h1>", "/site/"), self.docs)
+        self.assertEqual((self.docs / "archive" / "index.html").read_text(), before)
+        self.assertEqual(list(self.docs.rglob("*.tmp")), [])
+
+    def test_sitemap(self):
+        index, _, _ = self.build()
+        self.assertTrue(write_sitemap(index, self.docs, "/site/", "https://example.com"))
+        sitemap = (self.docs / SITEMAP_NAME).read_text()
+        self.assertIn("<url><loc>https://example.com/site/blog/new.html</loc><lastmod>2024-06-01</lastmod></url>", sitemap)
+        self.assertIn("<url><loc>https://example.com/site/archive/</loc></url>", sitemap)
+        self.assertFalse(write_sitemap(index, self.docs, "/site/", "https://example.com"))
+
+    def test_index_round_trip(self):
+        index, _, _ = self.build()
+        path = str(self.root / "cache" / "index.json")
+        save_site_index(index, path)
+        self.assertEqual(load_site_index(path), index)
+        self.assertIsNone(load_site_index(str(self.root / "missing.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from static_sync import *
+
+
+class TestStaticSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        self.docs = self.root / "docs"
+        self.manifest_path = str(self.root / "cache" / "static.json")
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "index.css").write_text("body {}")
+        (self.static / "images" / "a.png").write_bytes(b"\x89PNG a")
+        (self.static / "images" / "b.png").write_bytes(b"\x89PNG b")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, **kwargs):
+        return sync_static(self.static, self.docs, self.manifest_path, **kwargs)
+
+    def test_first_sync_copies_everything(self):
+        self.assertEqual(self.sync(), (3, 0, 0))
+        self.assertEqual((self.docs / "images" / "a.png").read_bytes(), b"\x89PNG a")
+        self.assertEqual(
+            os.stat(self.docs / "index.css").st_mtime_ns,
+            os.stat(self.static / "index.css").st_mtime_ns,
+        )
+
+    def test_unchanged_files_are_skipped(self):
+        self.sync()
+        self.assertEqual(self.sync(), (0, 3, 0))
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        (self.static / "index.css").write_text("body { color: red }")
+        self.assertEqual(self.sync(jobs=1), (1, 2, 0))
+        self.assertEqual((self.docs / "index.css").read_text(), "body { color: red }")
+
+    def test_checksum_ignores_mtime_only_changes(self):
+        self.sync()
+        os.utime(self.static / "index.css", (0, 0))
+        self.assertEqual(self.sync(checksum=True), (0, 3, 0))
+        self.assertEqual(self.sync(), (1, 2, 0))
+
+    def test_stale_files_are_removed(self):
+        (self.docs / "blog").mkdir(parents=True)
+        (self.docs / "blog" / "page.html").write_text("<p>rendered</p>")
+        self.sync()
+        (self.static / "images" / "a.png").unlink()
+        (self.static / "images" / "b.png").unlink()
+        self.assertEqual(self.sync(), (0, 1, 2))
+        self.assertFalse((self.docs / "images").exists())
+        # Files the sync didn't put there are left alone.
+        self.assertTrue((self.docs / "blog" / "page.html").exists())
+
+    def test_hardlink(self):
+        self.sync(hardlink=True)
+        self.assertTrue(os.path.samefile(self.static / "index.css", self.docs / "index.css"))
+        self.assertEqual(self.sync(hardlink=True), (0, 3, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from template import *
+from main import render_page
+
+
+class TestTemplate(unittest.TestCase):
+    def test_compile_splits_literals_and_slots(self):
+        template = Template("<title>{{ Title }}</title><p>{{Content}}</p>")
+        self.assertEqual(template.literals, ["<title>", "</title><p>", "</p>"])
+        self.assertEqual(template.slots, ["title", "content"])
+
+    def test_render(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(
+            template.render({"title": "Hi", "content": "<p>body</p>"}),
+            "<h1>Hi</h1><p>body</p>",
+        )
+
+    def test_missing_value_renders_empty(self):
+        template = Template("<time>{{ Date }}</time>")
+        self.assertEqual(template.render({}), "<time></time>")
+
+    def test_basepath_rewritten_at_compile_time(self):
+        template = Template('<link href="/index.css" /><img src="/a.png" /><a href="https://x.com">', "/site/")
+        self.assertEqual(
+            template.literals,
+            ['<link href="/site/index.css" /><img src="/site/a.png" /><a href="https://x.com">'],
+        )
+
+    def test_basepath_resolver_with_assets(self):
+        resolve_url = basepath_resolver("/site/", {"images/tom.png": "images/tom.abc.png"})
+        self.assertEqual(resolve_url("/images/tom.png"), "/site/images/tom.abc.png")
+        self.assertEqual(resolve_url("/blog/tom"), "/site/blog/tom")
+        self.assertEqual(resolve_url("images/tom.png"), "images/tom.png")
+
+    def test_basepath_resolver(self):
+        resolve_url = basepath_resolver("/site/")
+        self.assertEqual(resolve_url("/blog/tom"), "/site/blog/tom")
+        self.assertEqual(resolve_url("https://example.com"), "https://example.com")
+        self.assertEqual(resolve_url("//cdn.example.com/a.png"), "//cdn.example.com/a.png")
+        self.assertEqual(resolve_url("images/a.png"), "images/a.png")
+
+    def test_split_front_matter(self):
+        md = "---\ndate: 2024-05-01\nDescription: \"A page\"\n---\n# Title\n\nBody"
+        metadata, body = split_front_matter(md)
+        self.assertEqual(metadata, {"date": "2024-05-01", "description": "A page"})
+        self.assertEqual(body, "# Title\n\nBody")
+
+    def test_split_front_matter_absent(self):
+        self.assertEqual(split_front_matter("# Title"), ({}, "# Title"))
+
+    def test_split_front_matter_unclosed(self):
+        with self.assertRaises(ValueError):
+            split_front_matter("---\ndate: 2024\n# Title")
+
+    def test_split_front_matter_lines(self):
+        for md in ["---\ndate: 2024\n---\n# Title\n\nBody", "# Title\n---\nx", "---\n---", "---"]:
+            metadata, lines = split_front_matter_lines(md.splitlines(keepends=True))
+            self.assertEqual((metadata, "".join(lines)), split_front_matter(md))
+        with self.assertRaises(ValueError):
+            split_front_matter_lines(["---\n", "date: 2024\n"])
+
+    def test_render_page(self):
+        template = Template(
+            '<title>{{ Title }}</title><meta content="{{ Description }}">'
+            '<time>{{ Date }}</time><link href="/index.css">{{ Content }}',
+            "/site/",
+        )
+        md = "---\ndate: 2024-05-01\ndescription: About us\n---\n# About\n\n[home](/) and [ext](https://a.com)"
+        self.assertEqual(
+            render_page(md, template),
+            '<title>About</title><meta content="About us"><time>2024-05-01</time>'
+            '<link href="/site/index.css"><div><h1>About</h1>'
+            '<p><a href="/site/">home</a> and <a href="https://a.com">ext</a></p></div>',
+        )
+
+    def test_minify_html(self):
+        source = "<html>\n  <body>\n    <a>x</a>\n    <b>y</b>\n    <pre>\n  keep  </pre>\n  </body>\n</html>"
+        self.assertEqual(minify_html(source), "<html><body><a>x</a> <b>y</b><pre>\n  keep  </pre></body></html>")
+
+    def test_minified_template(self):
+        template = Template('<body>\n  <article>{{ Content }}</article>\n  <a href="/x">x</a>\n</body>', "/site/", minify=True)
+        self.assertEqual(template.literals, ["<body><article>", '</article><a href="/site/x">x</a></body>'])
+        self.assertEqual(
+            render_page("# T\n\n- [a](/a)\n- b", template),
+            '<body><article><div><h1>T</h1><ul><li><a href=/site/a>a</a><li>b</ul></div></article>'
+            '<a href="/site/x">x</a></body>',
+        )
+
+    def test_description_defaults_to_first_paragraph(self):
+        template = Template('<meta content="{{ Description }}">')
+        self.assertEqual(render_page("# About\n\nWe make **things**.", template), '<meta content="We make things.">')
+
+    def test_text_values_are_escaped(self):
+        template = Template('<title>{{ Title }}</title><meta content="{{ Description }}"><i>{{ Author }}</i>')
+        md = '---\nauthor: Tom <tom@example.com>\n---\n# Q&A\n\nHe said "hi" & <left>'
+        self.assertEqual(
+            render_page(md, template),
+            '<title>Q&amp;A</title><meta content="He said &quot;hi&quot; &amp; &lt;left&gt;">'
+            '<i>Tom &lt;tom@example.com&gt;</i>',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -33,6 +33,13 @@ class TestTextNode(unittest.TestCase):
         self.assertEqual(node, node2)
 
 
+    def test_no_instance_dict(self):
+        node = TextNode("This is a text node", TextType.LINK, "https://www.somewebsitehere.com")
+        self.assertFalse(hasattr(node, "__dict__"))
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
+
     class TestTextNodeToHTMLNode(unittest.TestCase):
         def test_text(self):
             node = TextNode("This is a text node", TextType.TEXT)
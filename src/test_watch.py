@@ -0,0 +1,87 @@
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from pathlib import Path
+from watch import *
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.static = self.root / "static"
+        self.docs = self.root / "docs"
+        self.template = self.root / "template.html"
+        (self.content / "blog").mkdir(parents=True)
+        self.static.mkdir()
+        (self.content / "index.md").write_text("# Home\n\n[post](/blog/post)")
+        (self.content / "blog" / "post.md").write_text("# Post")
+        self.template.write_text("<title>{{ Title }}</title>{{ Content }}")
+        self.watcher = Watcher(
+            str(self.content), str(self.static), str(self.template), str(self.docs), "/site/",
+            index_path=str(self.root / "cache" / "site_index.json"),
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshot_and_diff(self):
+        before = snapshot(self.watcher.paths())
+        self.assertIn(os.path.normpath(self.template), before)
+        (self.content / "new.md").write_text("# New")
+        (self.content / "blog" / "post.md").unlink()
+        changed, removed = diff_snapshots(before, snapshot(self.watcher.paths()))
+        self.assertEqual(changed, {os.path.normpath(self.content / "new.md")})
+        self.assertEqual(removed, {os.path.normpath(self.content / "blog" / "post.md")})
+
+    def test_content_change_renders_only_that_page(self):
+        index = os.path.normpath(self.content / "index.md")
+        self.assertEqual(self.watcher.apply({index}, set()), (1, 0))
+        self.assertIn('href="/site/blog/post"', (self.docs / "index.html").read_text())
+        self.assertFalse((self.docs / "blog" / "post.html").exists())
+
+    def test_template_change_renders_everything(self):
+        self.template.write_text("<main>{{ Content }}</main>")
+        self.assertEqual(self.watcher.apply({os.path.normpath(self.template)}, set()), (2, 0))
+        self.assertTrue((self.docs / "blog" / "post.html").read_text().startswith("<main>"))
+
+    def test_removed_page_deletes_output(self):
+        post = os.path.normpath(self.content / "blog" / "post.md")
+        self.watcher.apply({post}, set())
+        self.assertIn("Post", (self.docs / "blog" / "index.html").read_text())
+        (self.content / "blog" / "post.md").unlink()
+        self.assertEqual(self.watcher.apply(set(), {post}), (0, 1))
+        self.assertFalse((self.docs / "blog" / "post.html").exists())
+        self.assertFalse((self.docs / "blog" / "index.html").exists())
+
+    def test_server_uses_basepath(self):
+        self.docs.mkdir()
+        (self.docs / "index.html").write_text("hello")
+        (self.docs / "blog").mkdir()
+        (self.docs / "blog" / "index.html").write_text("blog")
+        server = make_server(self.docs, "/site/", port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(url + "/site/") as response:
+                self.assertEqual(response.read(), b"hello")
+            # Directories without the trailing slash redirect within the
+            # basepath.
+            with urllib.request.urlopen(url + "/site/blog?x=1") as response:
+                self.assertEqual(response.url, url + "/site/blog/?x=1")
+                self.assertEqual(response.read(), b"blog")
+            with self.assertRaises(urllib.error.HTTPError) as ctx:
+                urllib.request.urlopen(url + "/index.html")
+            self.assertEqual(ctx.exception.code, 404)
+            ctx.exception.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
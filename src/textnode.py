@@ -11,6 +11,10 @@ class TextType(Enum):
 
 
 class TextNode:
+    # __slots__ keeps every inline span down to three pointers instead of a
+    # per-instance dict; large documents create hundreds of thousands of these.
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
@@ -27,7 +31,9 @@ class TextNode:
         return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
     
 
-    def text_node_to_html_node(text_node):
+    def text_node_to_html_node(text_node, resolve_url=None, resolve_image=None):
+        # resolve_image, when given, returns extra props for an image's
+        # (unresolved) src, e.g. its dimensions, or None.
         if text_node.text_type == TextType.TEXT:
             return LeafNode(None, text_node.text)
         if text_node.text_type == TextType.BOLD:
@@ -36,10 +42,14 @@ class TextNode:
             return LeafNode("i", text_node.text)
         if text_node.text_type == TextType.CODE:
             return LeafNode("code", text_node.text)
+        url = text_node.url if resolve_url is None else resolve_url(text_node.url)
         if text_node.text_type == TextType.LINK:
-            return LeafNode("a", text_node.text, {"href": text_node.url})
+            return LeafNode("a", text_node.text, {"href": url})
         if text_node.text_type == TextType.IMAGE:
-            return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+            props = {"src": url, "alt": text_node.text}
+            if resolve_image is not None:
+                props.update(resolve_image(text_node.url) or {})
+            return LeafNode("img", "", props)
         raise Exception(f"invalid text type: {text_node.text_type}")
     
 
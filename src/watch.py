@@ -0,0 +1,225 @@
+import argparse
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from instrument import configure_logging, logger
+from main import BuildError, find_markdown_files, generate_pages_incremental, get_files_ready, render_pages, write_site_pages
+from manifest import load_manifest
+from site_index import INDEX_PATH, build_site_index, load_site_index
+from static_sync import sync_static
+from template import load_template
+
+
+CONTENT_PATH = "./content"
+STATIC_PATH = "./static"
+TEMPLATE_PATH = "./template.html"
+DOCS_PATH = "./docs"
+
+
+def snapshot(paths):
+    # Path -> (mtime_ns, size) for every file under the given files/dirs.
+    state = {}
+    for path in paths:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            state[os.path.normpath(path)] = (stat.st_mtime_ns, stat.st_size)
+            continue
+        for root, _, names in os.walk(path):
+            for name in names:
+                file_path = os.path.normpath(os.path.join(root, name))
+                try:
+                    stat = os.stat(file_path)
+                except FileNotFoundError:
+                    continue
+                state[file_path] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+def diff_snapshots(old, new):
+    changed = {path for path, key in new.items() if old.get(path) != key}
+    removed = set(old) - set(new)
+    return changed, removed
+
+
+def wait_for_changes(paths, previous, interval=0.5, debounce=0.2):
+    # Polls until something differs from previous, then keeps polling until
+    # nothing has changed for debounce seconds, so an editor writing several
+    # files (or one file several times) triggers a single rebuild.
+    while True:
+        time.sleep(interval)
+        current = snapshot(paths)
+        if current != previous:
+            break
+    while True:
+        time.sleep(debounce)
+        latest = snapshot(paths)
+        if latest == current:
+            return current
+        current = latest
+
+
+def is_under(path, directory):
+    return os.path.commonpath([os.path.abspath(path), os.path.abspath(directory)]) == os.path.abspath(directory)
+
+
+class Watcher:
+    def __init__(self, content_path, static_path, template_path, docs_path, basepath, jobs=1, site_url="", index_path=INDEX_PATH):
+        self.content_path = content_path
+        self.static_path = static_path
+        self.template_path = template_path
+        self.docs_path = docs_path
+        self.basepath = basepath
+        self.jobs = jobs
+        self.site_url = site_url
+        self.index_path = index_path
+        self.template = load_template(template_path, basepath)
+
+
+    def paths(self):
+        return [self.content_path, self.static_path, self.template_path]
+
+
+    def output_path(self, source):
+        relative = Path(source).relative_to(Path(self.content_path))
+        return Path(self.docs_path) / relative.with_suffix(".html")
+
+
+    def apply(self, changed, removed):
+        # Rebuilds whatever the changed/removed paths affect: a template edit
+        # re-renders every page, a markdown edit only that page, and static
+        # changes go through the incremental static sync.
+        template_changed = any(os.path.normpath(self.template_path) == path for path in changed)
+        if template_changed:
+            self.template = load_template(self.template_path, self.basepath)
+            sources = find_markdown_files(self.content_path)
+        else:
+            sources = sorted(
+                Path(path) for path in changed
+                if path.endswith(".md") and is_under(path, self.content_path)
+            )
+
+        deleted = 0
+        for path in sorted(removed):
+            if path.endswith(".md") and is_under(path, self.content_path):
+                output_path = self.output_path(path)
+                if output_path.exists():
+                    output_path.unlink()
+                    deleted += 1
+
+        failures = render_pages([(source, self.output_path(source)) for source in sources], self.template, self.jobs)
+        if failures:
+            logger.error(str(BuildError(failures)))
+
+        if sources or deleted:
+            self.refresh_listings()
+
+        if any(is_under(path, self.static_path) for path in changed | removed):
+            sync_static(self.static_path, self.docs_path)
+
+        logger.info(f"Rebuilt {len(sources) - len(failures)} page(s), removed {deleted}")
+        return len(sources) - len(failures), deleted
+
+
+    def refresh_listings(self):
+        # Unchanged pages keep their index entries, so this only re-reads
+        # the edited pages and rewrites the listings they appear in.
+        old_index = load_site_index(self.index_path)
+        index, _ = build_site_index(self.content_path, old_index)
+        write_site_pages(index, old_index, self.template, self.docs_path, self.site_url, self.index_path)
+
+
+class BasepathHandler(SimpleHTTPRequestHandler):
+    # Serves docs/ as if it were deployed under basepath, so the rewritten
+    # href/src URLs resolve the same way they do in production.
+    basepath = "/"
+
+    def route(self):
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        if path + "/" == self.basepath:
+            self.send_response(301)
+            self.send_header("Location", self.basepath)
+            self.end_headers()
+            return False
+        if not path.startswith(self.basepath):
+            self.send_error(404, "Outside of the site basepath")
+            return False
+        original = self.path
+        self.path = "/" + self.path[len(self.basepath):]
+        if not path.endswith("/") and os.path.isdir(self.translate_path(self.path)):
+            # SimpleHTTPRequestHandler would redirect to the path without
+            # the basepath; the slash has to be added to the full one.
+            self.send_response(301)
+            self.send_header("Location", path + "/" + original[len(path):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return False
+        return True
+
+    def do_GET(self):
+        if self.route():
+            super().do_GET()
+
+    def do_HEAD(self):
+        if self.route():
+            super().do_HEAD()
+
+    def log_message(self, format, *args):
+        logger.debug("serve: " + format % args)
+
+
+def make_server(docs_path, basepath, host="127.0.0.1", port=8888):
+    handler = type("Handler", (BasepathHandler,), {"basepath": basepath})
+    return ThreadingHTTPServer((host, port), functools.partial(handler, directory=os.path.abspath(docs_path)))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Rebuild the site on change and serve docs/")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--site-url", default="", metavar="URL", help="public URL of the site, used in sitemap.xml")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N", help="worker processes for page rendering")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls (default 0.5)")
+    parser.add_argument("--debounce", type=float, default=0.2, help="quiet period before rebuilding (default 0.2)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every file and request")
+    return parser.parse_args(argv)
+
+
+def watch(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging(logging.DEBUG if args.verbose else logging.INFO)
+
+    get_files_ready(os.path.dirname(os.path.abspath(__file__)), clean=load_manifest() is None)
+    try:
+        generate_pages_incremental(CONTENT_PATH, TEMPLATE_PATH, DOCS_PATH, args.basepath, jobs=args.jobs)
+    except BuildError as e:
+        logger.error(str(e))
+
+    watcher = Watcher(CONTENT_PATH, STATIC_PATH, TEMPLATE_PATH, DOCS_PATH, args.basepath, args.jobs, args.site_url)
+    watcher.refresh_listings()
+    server = make_server(DOCS_PATH, args.basepath, args.host, args.port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving {DOCS_PATH} at http://{args.host}:{server.server_address[1]}{args.basepath}")
+
+    state = snapshot(watcher.paths())
+    try:
+        while True:
+            new_state = wait_for_changes(watcher.paths(), state, args.interval, args.debounce)
+            changed, removed = diff_snapshots(state, new_state)
+            state = new_state
+            start = time.perf_counter()
+            watcher.apply(changed, removed)
+            logger.info(f"Rebuild took {(time.perf_counter() - start) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        logger.info("Stopping")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    watch()